@@ -0,0 +1,76 @@
+def build_leaper_attacks(directions: 'list[tuple[int, int]]') -> 'list[int]':
+    table = []
+    for square in range(64):
+        x, y = square & 7, square >> 3
+        attacks = 0
+        for dx, dy in directions:
+            if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+                attacks |= 1 << ((y + dy) * 8 + x + dx)
+        table.append(attacks)
+    return table
+
+def build_ray(direction: 'tuple[int, int]') -> 'list[int]':
+    dx, dy = direction
+    table = []
+    for square in range(64):
+        x, y = (square & 7) + dx, (square >> 3) + dy
+        ray = 0
+        while 0 <= x < 8 and 0 <= y < 8:
+            ray |= 1 << (y * 8 + x)
+            x += dx
+            y += dy
+        table.append(ray)
+    return table
+
+def build_rays(directions: 'list[tuple[int, int]]') -> 'list[tuple[list[int], bool]]':
+    # Rays going towards higher squares are cut at their lowest blocker, the others at their highest
+    return [(build_ray(direction), direction[1] * 8 + direction[0] > 0) for direction in directions]
+
+KNIGHT_ATTACKS = build_leaper_attacks([(1, 2), (1, -2), (-1, 2), (-1, -2), (2, 1), (2, -1), (-2, 1), (-2, -1)])
+KING_ATTACKS = build_leaper_attacks([(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)])
+
+# Squares attacked by a pawn standing on a square, indexed by [is_white][square]
+PAWN_ATTACKS = [
+    build_leaper_attacks([(1, 1), (-1, 1)]),
+    build_leaper_attacks([(1, -1), (-1, -1)]),
+]
+
+ROOKIE_RAYS = build_rays([(1, 0), (-1, 0), (0, 1), (0, -1)])
+BISHOP_RAYS = build_rays([(1, 1), (1, -1), (-1, 1), (-1, -1)])
+
+def build_between() -> 'list[list[int]]':
+    between = [[0] * 64 for _ in range(64)]
+    for ray, _ in ROOKIE_RAYS + BISHOP_RAYS:
+        for square in range(64):
+            targets = ray[square]
+            while targets:
+                target = targets & -targets
+                targets ^= target
+                between[square][target.bit_length() - 1] = ray[square] & ~ray[target.bit_length() - 1] & ~target
+    return between
+
+# Squares strictly between two squares sharing a line, empty otherwise
+BETWEEN = build_between()
+
+def get_sliding_attacks(square: int, occupied: int, rays: 'list[tuple[list[int], bool]]') -> int:
+    attacks = 0
+    for ray, is_increasing in rays:
+        ray_attacks = ray[square]
+        blockers = ray_attacks & occupied
+        if blockers:
+            if is_increasing:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray_attacks ^= ray[blocker]
+        attacks |= ray_attacks
+    return attacks
+
+def get_rookie_attacks(square: int, occupied: int) -> int:
+    return get_sliding_attacks(square, occupied, ROOKIE_RAYS)
+
+def get_bishop_attacks(square: int, occupied: int) -> int:
+    return get_sliding_attacks(square, occupied, BISHOP_RAYS)
+
+def get_queen_attacks(square: int, occupied: int) -> int:
+    return get_sliding_attacks(square, occupied, ROOKIE_RAYS) | get_sliding_attacks(square, occupied, BISHOP_RAYS)
@@ -0,0 +1,53 @@
+import numpy as np
+
+from engine.bitboard import PIECE_CODES, SCORE_TABLES, BitboardPosition
+from engine.position import Position
+
+EMPTY = len(PIECE_CODES)
+# Score of every piece on every square, with a row of zeros for empty squares
+SCORE_TABLE = np.array(SCORE_TABLES + [[0.0] * 64])
+# Byte of an expanded placement to its piece index, empty squares are written as '.'
+PIECE_INDEXES = np.full(256, -1, dtype=np.int8)
+PIECE_INDEXES[ord('.')] = EMPTY
+for index, fen_code in enumerate(PIECE_CODES):
+    PIECE_INDEXES[ord(fen_code)] = index
+
+def encode_positions(positions: 'list[Position | BitboardPosition]') -> np.ndarray:
+    # (N, 64) piece indexes of PIECE_CODES, EMPTY for empty squares
+    boards = np.full((len(positions), 64), EMPTY, dtype=np.int8)
+    for i, position in enumerate(positions):
+        for square in range(64):
+            fen_code = position.get_fen_code(square)
+            if fen_code is not None:
+                boards[i, square] = PIECE_CODES.index(fen_code)
+    return boards
+
+def encode_fens(fen_codes: 'list[str]') -> np.ndarray:
+    # Only the placement field is read, so no position has to be built
+    if not fen_codes:
+        return np.empty((0, 64), dtype=np.int8)
+    text = '\n'.join(fen_code.partition(' ')[0] for fen_code in fen_codes).replace('/', '')
+    for count in range(1, 9):
+        text = text.replace(str(count), '.' * count)
+    placements = text.split('\n')
+    if len(placements) != len(fen_codes) or any(len(placement) != 64 for placement in placements):
+        raise ValueError('Every FEN placement needs 64 squares')
+    expanded = ''.join(placements).encode('ascii', 'replace')
+    boards = PIECE_INDEXES[np.frombuffer(expanded, dtype=np.uint8)].reshape(len(fen_codes), 64)
+    if (boards < 0).any():
+        raise ValueError('Unknown piece in a FEN placement')
+    return boards
+
+def to_one_hot(boards: np.ndarray) -> np.ndarray:
+    # (N, 12, 64) with a one where each piece stands
+    return boards[:, None, :] == np.arange(EMPTY, dtype=np.int8)[None, :, None]
+
+def evaluate_boards(boards: np.ndarray, score_table: np.ndarray = SCORE_TABLE) -> np.ndarray:
+    # Same scores as Position.evaluate: black pieces add, white pieces subtract
+    return score_table[boards, np.arange(64)].sum(axis=1)
+
+def evaluate_one_hot(features: np.ndarray, score_table: np.ndarray = SCORE_TABLE) -> np.ndarray:
+    return np.einsum('npq,pq->n', features, score_table[:EMPTY])
+
+def evaluate_positions(positions: 'list[Position | BitboardPosition]') -> np.ndarray:
+    return evaluate_boards(encode_positions(positions))
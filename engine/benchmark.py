@@ -0,0 +1,173 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from typing import Callable
+
+from engine.parallel import ParallelSearch
+from engine.position import START_FEN
+from engine.profiler import Profiler
+from engine.search import MAX_DEPTH
+from util.moves import move_to_uci
+
+BENCHMARK_POSITIONS = [
+    ('start', START_FEN),
+    ('italian', 'r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3'),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'),
+    ('middlegame', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10'),
+    ('promotion', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8'),
+    ('rook-endgame', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'),
+    ('stalemate', '2Q2bnr/4p1pq/5pkr/7p/2P4P/8/PP1PPPP1/RNB1KBNR w KQ - 0 1'),
+    ('kingless', '8/8/8/8/8/1R6/N1B5/1b6 w - - 0 1'),
+]
+
+FIELDS = ['position', 'depth', 'time', 'nodes', 'nps', 'best_move', 'score']
+SCALING_FIELDS = ['workers', 'time', 'nodes', 'nps', 'speedup', 'node_ratio']
+
+def run_benchmark(
+    positions: 'list[tuple[str, str]]',
+    max_depth: int,
+    time_limit: float,
+    transposition_table_mb: float,
+    workers: int = 1,
+) -> 'tuple[list[dict], int]':
+    # Nodes of every worker, the rows hold the time each depth was first reached
+    rows = []
+    nodes = 0
+    search = ParallelSearch(workers, transposition_table_mb)
+    try:
+        for name, fen in positions:
+            # Every position starts from an empty table so runs are comparable
+            search.clear()
+            search.iterative_deepening(fen, time_limit, max_depth)
+            nodes += search.nodes
+            rows.extend(get_rows(name, search.iterations))
+    finally:
+        search.close()
+    return rows, nodes
+
+def run_scaling(
+    positions: 'list[tuple[str, str]]',
+    max_depth: int,
+    time_limit: float,
+    transposition_table_mb: float,
+    worker_counts: 'list[int]',
+) -> 'list[dict]':
+    # Time to depth sums the time each position took to reach its last depth, compared with the first worker count
+    rows = []
+    for workers in worker_counts:
+        iterations, nodes = run_benchmark(positions, max_depth, time_limit, transposition_table_mb, workers)
+        last_iterations = {row['position']: row for row in iterations}
+        time_to_depth = sum(row['time'] for row in last_iterations.values())
+        rows.append({
+            'workers': workers,
+            'time': round(time_to_depth, 4),
+            'nodes': nodes,
+            'nps': round(nodes / max(time_to_depth, 1e-9)),
+            'speedup': round(rows[0]['time'] / max(time_to_depth, 1e-9), 2) if rows else 1.0,
+            'node_ratio': round(nodes / max(rows[0]['nodes'], 1), 2) if rows else 1.0,
+        })
+        print(f'{workers} workers done', file=sys.stderr)
+    return rows
+
+def get_rows(name: str, iterations: 'list[dict]') -> 'list[dict]':
+    rows = []
+    for iteration in iterations:
+        move = iteration['best_move']
+        rows.append({
+            'position': name,
+            'depth': iteration['depth'],
+            'time': round(iteration['time'], 4),
+            'nodes': iteration['nodes'],
+            'nps': round(iteration['nodes'] / max(iteration['time'], 1e-9)),
+            'best_move': None if move is None else move_to_uci(move),
+            'score': iteration['score'],
+        })
+    return rows
+
+def format_row(row: dict) -> str:
+    return (
+        f"{row['position']:<13} depth {row['depth']:>2}  {row['time']:8.3f}s  {row['nodes']:>9} nodes"
+        f"  {row['nps']:>7} nps  {row['best_move'] or '-':<6} {row['score']}\n"
+    )
+
+def format_scaling_row(row: dict) -> str:
+    return (
+        f"{row['workers']:>2} workers  {row['time']:8.3f}s to depth  {row['nodes']:>9} nodes  {row['nps']:>7} nps"
+        f"  speedup {row['speedup']:5.2f}  nodes x{row['node_ratio']:.2f}\n"
+    )
+
+def write_rows(
+    rows: 'list[dict]',
+    output_format: str,
+    output,
+    fields: 'list[str]' = FIELDS,
+    format_text: 'Callable[[dict], str]' = format_row,
+):
+    if output_format == 'json':
+        json.dump(rows, output, indent=2)
+        output.write('\n')
+    elif output_format == 'csv':
+        writer = csv.DictWriter(output, fields, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            output.write(format_text(row))
+
+def main(args: 'list[str]' = None) -> int:
+    parser = argparse.ArgumentParser(description='Time the search on fixed positions.')
+    parser.add_argument('--depth', type=int, default=None, help='search every position to this depth')
+    parser.add_argument('--time', type=float, default=None, help='time limit per position in seconds')
+    parser.add_argument('--tt-mb', type=float, default=16, help='transposition table size')
+    parser.add_argument('--workers', type=int, default=1, help='processes of a Lazy SMP search')
+    parser.add_argument(
+        '--scaling',
+        type=int,
+        nargs='+',
+        metavar='WORKERS',
+        help='compare time to depth and nodes for these worker counts, like 1 2 4 8',
+    )
+    parser.add_argument('--positions', nargs='*', help='names of the positions to run, all by default')
+    parser.add_argument('--format', choices=['text', 'json', 'csv'], default='text')
+    parser.add_argument('--output', help='file to write to instead of stdout')
+    parser.add_argument('--profile', action='store_true', help='print the time spent in the hot functions')
+    options = parser.parse_args(args)
+
+    if options.depth is None and options.time is None:
+        options.depth = 4
+    positions = [
+        (name, fen) for name, fen in BENCHMARK_POSITIONS
+        if not options.positions or name in options.positions
+    ]
+
+    profiler = Profiler()
+    if options.profile:
+        profiler.enable()
+    max_depth = options.depth or MAX_DEPTH
+    time_limit = options.time if options.time is not None else float('inf')
+    start = time.perf_counter()
+    if options.scaling:
+        rows = run_scaling(positions, max_depth, time_limit, options.tt_mb, options.scaling)
+        fields, format_text = SCALING_FIELDS, format_scaling_row
+        nodes = sum(row['nodes'] for row in rows)
+    else:
+        rows, nodes = run_benchmark(positions, max_depth, time_limit, options.tt_mb, options.workers)
+        fields, format_text = FIELDS, format_row
+    elapsed = time.perf_counter() - start
+    profiler.disable()
+
+    if options.output:
+        with open(options.output, 'w', newline='') as output:
+            write_rows(rows, options.format, output, fields, format_text)
+    else:
+        write_rows(rows, options.format, sys.stdout, fields, format_text)
+
+    print(f'Total: {nodes} nodes in {elapsed:.2f}s, {nodes / max(elapsed, 1e-9):.0f} nps', file=sys.stderr)
+    if options.profile:
+        print(profiler.get_report(), file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,479 @@
+from engine.attacks import BETWEEN, BISHOP_RAYS, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, ROOKIE_RAYS, get_bishop_attacks, get_queen_attacks, get_rookie_attacks
+from engine.fen import format_fen, format_placement, parse_fen
+from engine.position import CASTLINGS, START_FEN
+from engine.zobrist import BLACK_TO_MOVE_KEY, EN_PASSANT_KEYS, PIECE_KEYS, get_castling_key
+from pieces.piece_code import PieceCode
+from pieces.piece_factory import PieceFactory
+from util.moves import CASTLE, EAT, EN_PASSANT, PROMOTE, PROMOTION_SHIFT, PROMOTIONS, encode_promotions, get_cell, get_square
+
+PAWN, KNIGHT, BISHOP, ROOKIE, QUEEN, KING = range(6)
+BLACK_OFFSET = 6
+FULL_BOARD = (1 << 64) - 1
+
+PIECE_CODES = [
+    PieceCode.PAWN, PieceCode.KNIGHT, PieceCode.BISHOP, PieceCode.ROOKIE, PieceCode.QUEEN, PieceCode.KING,
+    PieceCode.PAWN.lower(), PieceCode.KNIGHT.lower(), PieceCode.BISHOP.lower(),
+    PieceCode.ROOKIE.lower(), PieceCode.QUEEN.lower(), PieceCode.KING.lower(),
+]
+PROMOTION_PIECES = [PIECE_CODES.index(fen_code) for fen_code in PROMOTIONS]
+
+# Same values as Position.evaluate: black pieces add, white pieces subtract
+SCORE_TABLES = [
+    [(-1 if fen_code.isupper() else 1) * PieceFactory.create(fen_code).score(get_cell(square)) for square in range(64)]
+    for fen_code in PIECE_CODES
+]
+
+HASH_KEYS = [PIECE_KEYS[fen_code] for fen_code in PIECE_CODES]
+
+CASTLING_BITS = {right: 1 << i for i, right in enumerate(CASTLINGS)}
+CASTLING_HASH_KEYS = [
+    get_castling_key(''.join(right for right, bit in CASTLING_BITS.items() if castling_rights & bit))
+    for castling_rights in range(16)
+]
+CASTLING_PATHS = {}
+CASTLING_ROOKIE_SQUARES = {}
+CASTLING_KEPT_RIGHTS = [15] * 64
+for right, (king_cell, rookie_cell, king_to, rookie_to) in CASTLINGS.items():
+    king_square, rookie_square = get_square(*king_cell), get_square(*rookie_cell)
+    path = 0
+    for square in range(min(king_square, rookie_square) + 1, max(king_square, rookie_square)):
+        path |= 1 << square
+    king_path = range(min(king_square, get_square(*king_to)), max(king_square, get_square(*king_to)) + 1)
+    CASTLING_PATHS[right] = (CASTLING_BITS[right], king_square, path, king_path, get_square(*king_to) << 6 | king_square | CASTLE)
+    CASTLING_ROOKIE_SQUARES[get_square(*king_to)] = (rookie_square, get_square(*rookie_to))
+    CASTLING_KEPT_RIGHTS[king_square] &= ~CASTLING_BITS[right]
+    CASTLING_KEPT_RIGHTS[rookie_square] &= ~CASTLING_BITS[right]
+
+class BitboardPosition:
+    def __init__(self, fen_code: str = START_FEN):
+        placement, self.is_white_turn, castling_rights, self.en_passant_square, self.halfmove_clock, self.fullmove_number = (
+            parse_fen(fen_code)
+        )
+        self.bitboards = [0] * 12
+        self.occupancy = [0, 0]
+        self.squares: list[int] = [None] * 64
+        self.score = 0
+        self.hash = 0
+        self.setup_board(placement)
+
+        # Rights whose king or rookie has left its square are dropped
+        possible_rights = self.infer_castling_rights()
+        if castling_rights is None:
+            castling_rights = possible_rights
+        self.castling_rights = sum(CASTLING_BITS[right] for right in castling_rights if right in possible_rights)
+
+        self.hash ^= CASTLING_HASH_KEYS[self.castling_rights] ^ self.get_en_passant_hash()
+        if not self.is_white_turn:
+            self.hash ^= BLACK_TO_MOVE_KEY
+
+        self.history = []
+
+    def setup_board(self, fen_code: str):
+        for y, row in enumerate(fen_code.split('/')):
+            x = 0
+            for item in row:
+                if item.isdigit():
+                    x += int(item)
+                else:
+                    self.put_piece(PIECE_CODES.index(item), get_square(x, y))
+                    x += 1
+
+    def infer_castling_rights(self) -> str:
+        castling_rights = ''
+        for right, (king_cell, rookie_cell, _, _) in CASTLINGS.items():
+            offset = 0 if right.isupper() else BLACK_OFFSET
+            if self.squares[get_square(*king_cell)] == offset + KING and self.squares[get_square(*rookie_cell)] == offset + ROOKIE:
+                castling_rights += right
+        return castling_rights
+
+    def put_piece(self, piece: int, square: int):
+        bit = 1 << square
+        self.bitboards[piece] |= bit
+        self.occupancy[piece < BLACK_OFFSET] |= bit
+        self.squares[square] = piece
+        self.score += SCORE_TABLES[piece][square]
+        self.hash ^= HASH_KEYS[piece][square]
+
+    def remove_piece(self, piece: int, square: int):
+        bit = 1 << square
+        self.bitboards[piece] ^= bit
+        self.occupancy[piece < BLACK_OFFSET] ^= bit
+        self.squares[square] = None
+        self.score -= SCORE_TABLES[piece][square]
+        self.hash ^= HASH_KEYS[piece][square]
+
+    def get_fen_code(self, square: int) -> str:
+        piece = self.squares[square]
+        if piece is None:
+            return None
+        return PIECE_CODES[piece]
+
+    def get_fen(self) -> str:
+        castling_rights = ''.join(right for right, bit in CASTLING_BITS.items() if self.castling_rights & bit)
+        return format_fen(
+            format_placement([self.get_fen_code(square) for square in range(64)]),
+            self.is_white_turn,
+            castling_rights,
+            self.en_passant_square,
+            self.halfmove_clock,
+            self.fullmove_number,
+        )
+
+    def get_all_movements(self) -> 'list[int]':
+        return self.generate_movements(FULL_BOARD, {}, False)
+
+    def legal_moves(self) -> 'list[int]':
+        is_white = self.is_white_turn
+        king = self.bitboards[KING if is_white else BLACK_OFFSET + KING]
+        if not king:
+            return self.get_all_movements()
+
+        king_square = king.bit_length() - 1
+        checkers = self.get_attackers(king_square, not is_white, self.occupancy[0] | self.occupancy[1])
+        if checkers & (checkers - 1):
+            return self.get_king_movements(king_square, is_white, True)
+
+        check_mask = FULL_BOARD
+        if checkers:
+            check_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        return self.generate_movements(check_mask, self.get_pins(king_square, is_white), True)
+
+    def has_any_legal_move(self) -> bool:
+        is_white = self.is_white_turn
+        offset = 0 if is_white else BLACK_OFFSET
+        bitboards = self.bitboards
+        king = bitboards[offset + KING]
+        if not king:
+            return len(self.get_all_movements()) > 0
+
+        king_square = king.bit_length() - 1
+        if self.get_king_movements(king_square, is_white, True):
+            return True
+        own = self.occupancy[is_white]
+        enemy = self.occupancy[not is_white]
+        occupied = own | enemy
+        checkers = self.get_attackers(king_square, not is_white, occupied)
+        if checkers & (checkers - 1):
+            return False
+
+        check_mask = FULL_BOARD
+        if checkers:
+            check_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        pins = self.get_pins(king_square, is_white)
+
+        # Pieces are walked one at a time, the first target left by the check and pin masks ends the search
+        for piece in (KNIGHT, BISHOP, ROOKIE, QUEEN):
+            pieces = bitboards[offset + piece]
+            while pieces:
+                bit = pieces & -pieces
+                pieces ^= bit
+                square = bit.bit_length() - 1
+
+                if piece == KNIGHT:
+                    targets = KNIGHT_ATTACKS[square]
+                elif piece == BISHOP:
+                    targets = get_bishop_attacks(square, occupied)
+                elif piece == ROOKIE:
+                    targets = get_rookie_attacks(square, occupied)
+                else:
+                    targets = get_queen_attacks(square, occupied)
+                if targets & ~own & check_mask & pins.get(square, FULL_BOARD):
+                    return True
+
+        pawns = bitboards[offset + PAWN]
+        push, start_row = (-8, 6) if is_white else (8, 1)
+        while pawns:
+            bit = pawns & -pawns
+            pawns ^= bit
+            square = bit.bit_length() - 1
+            mask = check_mask & pins.get(square, FULL_BOARD)
+
+            to_square = square + push
+            if not occupied >> to_square & 1:
+                if mask >> to_square & 1:
+                    return True
+                if square >> 3 == start_row and not occupied >> (to_square + push) & 1 and mask >> (to_square + push) & 1:
+                    return True
+            if PAWN_ATTACKS[is_white][square] & enemy & mask:
+                return True
+
+        if self.en_passant_square is not None:
+            to_square = self.en_passant_square
+            pawns = PAWN_ATTACKS[not is_white][to_square] & bitboards[offset + PAWN]
+            while pawns:
+                bit = pawns & -pawns
+                pawns ^= bit
+                if self.is_legal_en_passant(bit.bit_length() - 1, to_square, to_square - push, is_white):
+                    return True
+        return False
+
+    def get_pins(self, king_square: int, is_white: bool) -> 'dict[int, int]':
+        offset = BLACK_OFFSET if is_white else 0
+        bitboards = self.bitboards
+        own = self.occupancy[is_white]
+        occupied = self.occupancy[0] | self.occupancy[1]
+        pins = {}
+
+        for rays, sliders in (
+            (ROOKIE_RAYS, bitboards[offset + ROOKIE] | bitboards[offset + QUEEN]),
+            (BISHOP_RAYS, bitboards[offset + BISHOP] | bitboards[offset + QUEEN]),
+        ):
+            if not sliders:
+                continue
+
+            for ray, is_increasing in rays:
+                blockers = ray[king_square] & occupied
+                if not blockers:
+                    continue
+
+                first = blockers & -blockers if is_increasing else 1 << (blockers.bit_length() - 1)
+                blockers ^= first
+                if not first & own or not blockers:
+                    continue
+
+                second = blockers & -blockers if is_increasing else 1 << (blockers.bit_length() - 1)
+                if second & sliders:
+                    pinner_square = second.bit_length() - 1
+                    pins[first.bit_length() - 1] = BETWEEN[king_square][pinner_square] | second
+        return pins
+
+    def generate_movements(self, check_mask: int, pins: 'dict[int, int]', is_legal: bool) -> 'list[int]':
+        is_white = self.is_white_turn
+        offset = 0 if is_white else BLACK_OFFSET
+        bitboards = self.bitboards
+        own = self.occupancy[is_white]
+        enemy = self.occupancy[not is_white]
+        occupied = own | enemy
+        movements = []
+
+        pawns = bitboards[offset + PAWN]
+        pawn_attacks = PAWN_ATTACKS[is_white]
+        if is_white:
+            push, start_row, last_row = -8, 6, 0
+        else:
+            push, start_row, last_row = 8, 1, 7
+        while pawns:
+            bit = pawns & -pawns
+            pawns ^= bit
+            square = bit.bit_length() - 1
+            mask = check_mask
+            if square in pins:
+                mask &= pins[square]
+
+            to_square = square + push
+            if not occupied >> to_square & 1:
+                if mask >> to_square & 1:
+                    if to_square >> 3 == last_row:
+                        movements.extend(encode_promotions(square, to_square))
+                    else:
+                        movements.append(square | to_square << 6)
+                if square >> 3 == start_row and not occupied >> (to_square + push) & 1 and mask >> (to_square + push) & 1:
+                    movements.append(square | (to_square + push) << 6)
+
+            targets = pawn_attacks[square] & enemy & mask
+            while targets:
+                target = targets & -targets
+                targets ^= target
+                to_square = target.bit_length() - 1
+                if to_square >> 3 == last_row:
+                    movements.extend(encode_promotions(square, to_square, EAT))
+                else:
+                    movements.append(square | to_square << 6 | EAT)
+
+        if self.en_passant_square is not None:
+            to_square = self.en_passant_square
+            eaten_square = to_square - push
+            pawns = PAWN_ATTACKS[not is_white][to_square] & bitboards[offset + PAWN]
+            while pawns:
+                bit = pawns & -pawns
+                pawns ^= bit
+                square = bit.bit_length() - 1
+                if not is_legal or self.is_legal_en_passant(square, to_square, eaten_square, is_white):
+                    movements.append(square | to_square << 6 | EAT | EN_PASSANT)
+
+        for piece in (KNIGHT, BISHOP, ROOKIE, QUEEN):
+            pieces = bitboards[offset + piece]
+            while pieces:
+                bit = pieces & -pieces
+                pieces ^= bit
+                square = bit.bit_length() - 1
+
+                if piece == KNIGHT:
+                    targets = KNIGHT_ATTACKS[square]
+                elif piece == BISHOP:
+                    targets = get_bishop_attacks(square, occupied)
+                elif piece == ROOKIE:
+                    targets = get_rookie_attacks(square, occupied)
+                else:
+                    targets = get_queen_attacks(square, occupied)
+
+                targets &= ~own & check_mask
+                if square in pins:
+                    targets &= pins[square]
+                while targets:
+                    target = targets & -targets
+                    targets ^= target
+                    if target & enemy:
+                        movements.append(square | (target.bit_length() - 1) << 6 | EAT)
+                    else:
+                        movements.append(square | (target.bit_length() - 1) << 6)
+
+        king = bitboards[offset + KING]
+        if king:
+            movements.extend(self.get_king_movements(king.bit_length() - 1, is_white, is_legal))
+        return movements
+
+    def is_legal_en_passant(self, from_square: int, to_square: int, eaten_square: int, is_white: bool) -> bool:
+        king = self.bitboards[KING if is_white else BLACK_OFFSET + KING]
+        if not king:
+            return True
+
+        # Both pawns leave the line of the king, so pins and checks are looked up on the resulting board
+        occupied = (self.occupancy[0] | self.occupancy[1]) ^ (1 << from_square) ^ (1 << eaten_square) | 1 << to_square
+        return not self.get_attackers(king.bit_length() - 1, not is_white, occupied) & ~(1 << eaten_square)
+
+    def get_king_movements(self, square: int, is_white: bool, is_legal: bool) -> 'list[int]':
+        own = self.occupancy[is_white]
+        enemy = self.occupancy[not is_white]
+        movements = []
+
+        targets = KING_ATTACKS[square] & ~own
+        occupied = (own | enemy) ^ (1 << square)
+        while targets:
+            target = targets & -targets
+            targets ^= target
+            to_square = target.bit_length() - 1
+            if is_legal and self.get_attackers(to_square, not is_white, occupied):
+                continue
+            if target & enemy:
+                movements.append(square | to_square << 6 | EAT)
+            else:
+                movements.append(square | to_square << 6)
+
+        if self.castling_rights:
+            for right, (right_bit, king_square, path, king_path, movement) in CASTLING_PATHS.items():
+                if right.isupper() != is_white or not self.castling_rights & right_bit:
+                    continue
+                if square == king_square and not (own | enemy) & path:
+                    if not any(self.is_square_attacked(king_path_square, not is_white) for king_path_square in king_path):
+                        movements.append(movement)
+        return movements
+
+    def move_piece(self, movement: int) -> int:
+        from_square = movement & 63
+        to_square = movement >> 6 & 63
+        piece = self.squares[from_square]
+        eaten_square = to_square ^ 8 if movement & EN_PASSANT else to_square
+        eaten_piece = self.squares[eaten_square]
+        self.history.append((movement, piece, eaten_piece, self.castling_rights, self.en_passant_square, self.halfmove_clock, self.hash))
+        self.hash ^= self.get_en_passant_hash()
+
+        if eaten_piece is not None:
+            self.remove_piece(eaten_piece, eaten_square)
+        self.remove_piece(piece, from_square)
+
+        if movement & PROMOTE:
+            promoted_piece = PROMOTION_PIECES[movement >> PROMOTION_SHIFT & 3]
+            if piece >= BLACK_OFFSET:
+                promoted_piece += BLACK_OFFSET
+            self.put_piece(promoted_piece, to_square)
+        else:
+            self.put_piece(piece, to_square)
+
+        if movement & CASTLE:
+            rookie_from, rookie_to = CASTLING_ROOKIE_SQUARES[to_square]
+            rookie = self.squares[rookie_from]
+            self.remove_piece(rookie, rookie_from)
+            self.put_piece(rookie, rookie_to)
+
+        castling_rights = self.castling_rights & CASTLING_KEPT_RIGHTS[from_square] & CASTLING_KEPT_RIGHTS[to_square]
+        self.hash ^= CASTLING_HASH_KEYS[self.castling_rights] ^ CASTLING_HASH_KEYS[castling_rights] ^ BLACK_TO_MOVE_KEY
+        self.castling_rights = castling_rights
+
+        self.en_passant_square = None
+        if piece % BLACK_OFFSET == PAWN and abs(to_square - from_square) == 16:
+            self.en_passant_square = (from_square + to_square) >> 1
+
+        self.halfmove_clock = 0 if eaten_piece is not None or piece % BLACK_OFFSET == PAWN else self.halfmove_clock + 1
+        if not self.is_white_turn:
+            self.fullmove_number += 1
+        self.is_white_turn = not self.is_white_turn
+        self.hash ^= self.get_en_passant_hash()
+        return eaten_piece
+
+    def undo_move_piece(self):
+        movement, piece, eaten_piece, castling_rights, en_passant_square, halfmove_clock, key = self.history.pop()
+        from_square = movement & 63
+        to_square = movement >> 6 & 63
+
+        if movement & CASTLE:
+            rookie_from, rookie_to = CASTLING_ROOKIE_SQUARES[to_square]
+            rookie = self.squares[rookie_to]
+            self.remove_piece(rookie, rookie_to)
+            self.put_piece(rookie, rookie_from)
+
+        self.remove_piece(self.squares[to_square], to_square)
+        self.put_piece(piece, from_square)
+        if eaten_piece is not None:
+            self.put_piece(eaten_piece, to_square ^ 8 if movement & EN_PASSANT else to_square)
+
+        self.castling_rights = castling_rights
+        self.en_passant_square = en_passant_square
+        self.halfmove_clock = halfmove_clock
+        self.hash = key
+        self.is_white_turn = not self.is_white_turn
+        if not self.is_white_turn:
+            self.fullmove_number -= 1
+
+    def get_en_passant_hash(self) -> int:
+        if self.en_passant_square is None:
+            return 0
+
+        # Only keyed when a pawn can take it, as in Polyglot hashes
+        pawns = self.bitboards[PAWN if self.is_white_turn else BLACK_OFFSET + PAWN]
+        if PAWN_ATTACKS[not self.is_white_turn][self.en_passant_square] & pawns:
+            return EN_PASSANT_KEYS[self.en_passant_square & 7]
+        return 0
+
+    def player_is_checked(self, is_white: bool) -> bool:
+        king = self.bitboards[KING if is_white else BLACK_OFFSET + KING]
+        if not king:
+            return False
+        return self.is_square_attacked(king.bit_length() - 1, not is_white)
+
+    def is_square_attacked(self, square: int, by_white: bool) -> bool:
+        offset = 0 if by_white else BLACK_OFFSET
+        bitboards = self.bitboards
+        if KNIGHT_ATTACKS[square] & bitboards[offset + KNIGHT]:
+            return True
+        if PAWN_ATTACKS[not by_white][square] & bitboards[offset + PAWN]:
+            return True
+        if KING_ATTACKS[square] & bitboards[offset + KING]:
+            return True
+
+        occupied = self.occupancy[0] | self.occupancy[1]
+        if get_rookie_attacks(square, occupied) & (bitboards[offset + ROOKIE] | bitboards[offset + QUEEN]):
+            return True
+        return bool(get_bishop_attacks(square, occupied) & (bitboards[offset + BISHOP] | bitboards[offset + QUEEN]))
+
+    def get_attackers(self, square: int, by_white: bool, occupied: int) -> int:
+        offset = 0 if by_white else BLACK_OFFSET
+        bitboards = self.bitboards
+        return (
+            KNIGHT_ATTACKS[square] & bitboards[offset + KNIGHT]
+            | PAWN_ATTACKS[not by_white][square] & bitboards[offset + PAWN]
+            | KING_ATTACKS[square] & bitboards[offset + KING]
+            | get_rookie_attacks(square, occupied) & (bitboards[offset + ROOKIE] | bitboards[offset + QUEEN])
+            | get_bishop_attacks(square, occupied) & (bitboards[offset + BISHOP] | bitboards[offset + QUEEN])
+        )
+
+    def get_piece_count(self) -> int:
+        return (self.occupancy[0] | self.occupancy[1]).bit_count()
+
+    def check_game_result(self) -> 'tuple[bool, bool]':
+        is_checked = self.player_is_checked(self.is_white_turn)
+        is_stalemate = not self.has_any_legal_move()
+        return (is_checked and is_stalemate, is_stalemate)
+
+    def evaluate(self) -> float:
+        return self.score
@@ -0,0 +1,172 @@
+import argparse
+import json
+import mmap
+import random
+import struct
+import sys
+from typing import Iterable, Iterator
+
+from engine.bitboard import BitboardPosition
+from engine.pgn import read_pgn
+from engine.position import START_FEN, Position
+from util.moves import PROMOTIONS, get_cell, get_from_square, get_promotion, get_to_square, move_to_uci
+
+# Polyglot layout: big-endian key, move, weight and learn fields, sorted by key
+ENTRY = struct.Struct('>QHHI')
+MAX_WEIGHT = 0xFFFF
+# Polyglot promotion codes: none, knight, bishop, rook, queen
+BOOK_PROMOTIONS = [None, PROMOTIONS[3], PROMOTIONS[2], PROMOTIONS[1], PROMOTIONS[0]]
+# Weight given to a move by the result of the game for the side playing it
+RESULT_WEIGHTS = {1.0: 2, 0.5: 1, 0.0: 0}
+PGN_SCORES = {'1-0': 1.0, '1/2-1/2': 0.5, '0-1': 0.0}
+
+def encode_book_move(move: int) -> int:
+    # Polyglot counts rows from the first rank, castling keeps the king's own destination
+    from_x, from_y = get_cell(get_from_square(move))
+    to_x, to_y = get_cell(get_to_square(move))
+    return to_x | (7 - to_y) << 3 | from_x << 6 | (7 - from_y) << 9 | BOOK_PROMOTIONS.index(get_promotion(move)) << 12
+
+def find_move(position: 'Position | BitboardPosition', code: str) -> int:
+    for move in position.legal_moves():
+        if move_to_uci(move) == code:
+            return move
+    return None
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.size = 0
+        self.data = None
+        if self.file.seek(0, 2):
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.size = len(self.data) // ENTRY.size
+
+    def get_entries(self, key: int) -> 'list[tuple[int, int]]':
+        # Lower bound binary search, entries of a position are stored next to each other
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if ENTRY.unpack_from(self.data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        while low < self.size:
+            entry_key, book_move, weight, _ = ENTRY.unpack_from(self.data, low * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((book_move, weight))
+            low += 1
+        return entries
+
+    def get_moves(self, position: 'Position | BitboardPosition') -> 'list[tuple[int, int]]':
+        entries = dict(self.get_entries(position.hash))
+        if not entries:
+            return []
+        # Entries are matched against the legal moves so a hash collision can never play an illegal move
+        return [
+            (move, entries[encode_book_move(move)])
+            for move in position.legal_moves()
+            if encode_book_move(move) in entries
+        ]
+
+    def get_move(self, position: 'Position | BitboardPosition', generator: random.Random = random) -> int:
+        moves = [(move, weight) for move, weight in self.get_moves(position) if weight > 0]
+        if not moves:
+            return None
+        return generator.choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+
+def report_skipped_game(error: ValueError):
+    print(f'Skipped {error}', file=sys.stderr)
+
+def decode_game(codes: 'list[str]') -> 'list[int]':
+    # UCI moves from the start position, up to the first one that is not legal
+    position = BitboardPosition(START_FEN)
+    moves = []
+    for code in codes:
+        move = find_move(position, code)
+        if move is None:
+            break
+        position.move_piece(move)
+        moves.append(move)
+    return moves
+
+def read_games(path: str) -> 'Iterator[tuple[list[int], float]]':
+    # PGN files, tournament JSON lines with their results, or one game of UCI moves per line, read one game at a time
+    if path.endswith('.pgn'):
+        for headers, moves, _ in read_pgn(path, on_error=report_skipped_game):
+            # Games set up from another position cannot be replayed from the start
+            if 'FEN' not in headers:
+                yield moves, PGN_SCORES.get(headers.get('Result'))
+        return
+
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                first_score = {'win': 1.0, 'draw': 0.5, 'loss': 0.0}[record['result']]
+                white_score = first_score if record['first_is_white'] else 1 - first_score
+                yield decode_game(record['moves'].split()), white_score
+            else:
+                yield decode_game(line.split()), None
+
+def build_book(games: 'Iterable[tuple[list[int], float]]', max_plies: int) -> 'tuple[dict[tuple[int, int], int], int]':
+    weights = {}
+    game_count = 0
+    for moves, white_score in games:
+        game_count += 1
+        position = BitboardPosition(START_FEN)
+        for move in moves[:max_plies]:
+            weight = 1
+            if white_score is not None:
+                weight = RESULT_WEIGHTS[white_score if position.is_white_turn else 1 - white_score]
+            entry = (position.hash, encode_book_move(move))
+            weights[entry] = weights.get(entry, 0) + weight
+            position.move_piece(move)
+    return weights, game_count
+
+def write_book(path: str, weights: 'dict[tuple[int, int], int]', min_weight: int = 1):
+    with open(path, 'wb') as file:
+        for (key, book_move), weight in sorted(weights.items()):
+            if weight >= min_weight:
+                file.write(ENTRY.pack(key, book_move, min(weight, MAX_WEIGHT), 0))
+
+def main(args: 'list[str]' = None) -> int:
+    parser = argparse.ArgumentParser(description='Build or query an opening book.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='build a book from game records')
+    build.add_argument('output')
+    build.add_argument('games', nargs='+', help='PGN files, tournament JSON lines or files with one game of UCI moves per line')
+    build.add_argument('--plies', type=int, default=16, help='plies of each game added to the book')
+    build.add_argument('--min-weight', type=int, default=1)
+    probe = commands.add_parser('probe', help='list the book moves of a position')
+    probe.add_argument('book')
+    probe.add_argument('--fen', default=START_FEN)
+    options = parser.parse_args(args)
+
+    if options.command == 'build':
+        games = (game for path in options.games for game in read_games(path))
+        weights, game_count = build_book(games, options.plies)
+        write_book(options.output, weights, options.min_weight)
+        print(f'{game_count} games, {len(weights)} entries written to {options.output}')
+        return 0
+
+    book = OpeningBook(options.book)
+    for move, weight in sorted(book.get_moves(BitboardPosition(options.fen)), key=lambda item: item[1], reverse=True):
+        print(f'{move_to_uci(move)}: {weight}')
+    book.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
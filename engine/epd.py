@@ -0,0 +1,68 @@
+import re
+from typing import Iterator
+
+from engine.bitboard import BitboardPosition
+from engine.position import Position
+
+# Operands are bare words or double quoted strings, operations end with a semicolon
+OPERATION_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"|(;)|([^\s;"]+)')
+# Plain FEN lines, and EPD lines written from them, still carry the two clocks after the fourth field
+FEN_CLOCKS = re.compile(r'(\d+)\s+(\d+)(?=\s|;|$)\s*')
+STRING_OPCODES = {'id', *[f'c{i}' for i in range(10)]}
+
+def parse_epd(line: str) -> 'tuple[str, dict[str, list[str]]]':
+    fields = line.split(maxsplit=4)
+    if len(fields) < 4:
+        raise ValueError(f'Invalid EPD {line!r}: expected at least 4 fields')
+
+    rest = fields[4] if len(fields) > 4 else ''
+    clocks = FEN_CLOCKS.match(rest)
+    if clocks is not None:
+        rest = rest[clocks.end():]
+
+    operations = {}
+    operation = []
+    for match in OPERATION_TOKEN.finditer(rest):
+        quoted, separator, word = match.groups()
+        if separator is None:
+            operation.append(word if word is not None else re.sub(r'\\(.)', r'\1', quoted))
+        elif operation:
+            operations[operation[0]] = operation[1:]
+            operation = []
+    if operation:
+        operations[operation[0]] = operation[1:]
+
+    if clocks is not None:
+        halfmove_clock, fullmove_number = clocks.groups()
+    else:
+        halfmove_clock = operations.get('hmvc', ['0'])[0]
+        fullmove_number = operations.get('fmvn', ['1'])[0]
+    return ' '.join(fields[:4] + [halfmove_clock, fullmove_number]), operations
+
+def format_operand(opcode: str, operand: str) -> str:
+    if opcode in STRING_OPCODES or not operand or re.search(r'[\s;"]', operand):
+        return '"' + operand.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return operand
+
+def format_epd(position: 'Position | BitboardPosition', operations: 'dict[str, list[str]]' = None) -> str:
+    fields = position.get_fen().split()[:4]
+    for opcode, operands in (operations or {}).items():
+        fields.append(' '.join([opcode, *[format_operand(opcode, operand) for operand in operands]]) + ';')
+    return ' '.join(fields)
+
+def read_epd(
+    path: str,
+    position_class: 'type[Position | BitboardPosition]' = BitboardPosition,
+) -> 'Iterator[tuple[Position | BitboardPosition, dict[str, list[str]]]]':
+    # Lines are parsed as they are read, so files of any size take constant memory
+    with open(path) as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                fen, operations = parse_epd(line)
+                position = position_class(fen)
+            except ValueError as error:
+                raise ValueError(f'{path}:{line_number}: {error}') from None
+            yield position, operations
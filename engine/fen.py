@@ -0,0 +1,100 @@
+import re
+
+from pieces.piece_code import PieceCode
+from util.moves import get_cell, parse_square
+from util.utils import to_code
+
+PIECE_CODES = {
+    code
+    for piece_code in (PieceCode.PAWN, PieceCode.KNIGHT, PieceCode.BISHOP, PieceCode.ROOKIE, PieceCode.QUEEN, PieceCode.KING)
+    for code in (piece_code, piece_code.lower())
+}
+CASTLING_FIELD = re.compile('-|K?Q?k?q?')
+# The square passed over, on the sixth row when white is to move and on the third otherwise
+EN_PASSANT_FIELDS = {True: re.compile('-|[a-h]6'), False: re.compile('-|[a-h]3')}
+
+def get_row_width(row: str) -> int:
+    width = 0
+    for item in row:
+        if item in '12345678':
+            width += int(item)
+        elif item in PIECE_CODES:
+            width += 1
+        else:
+            raise ValueError(f'unknown piece {item!r}')
+    return width
+
+def parse_counter(fields: 'list[str]', index: int, default: int, minimum: int) -> int:
+    if len(fields) <= index:
+        return default
+    if not fields[index].isdigit() or int(fields[index]) < minimum:
+        raise ValueError(f'invalid move counter {fields[index]!r}')
+    return int(fields[index])
+
+# Trailing fields may be left out: white to move, castling rights read from the board, no en passant, new clocks
+def parse_fen(fen_code: str) -> 'tuple[str, bool, str, int, int, int]':
+    fields = fen_code.split()
+    try:
+        if not 1 <= len(fields) <= 6:
+            raise ValueError(f'expected 1 to 6 fields, got {len(fields)}')
+
+        rows = fields[0].split('/')
+        if len(rows) != 8 or any(get_row_width(row) != 8 for row in rows):
+            raise ValueError('the board needs 8 rows of 8 squares')
+
+        side = fields[1] if len(fields) > 1 else 'w'
+        if side not in ('w', 'b'):
+            raise ValueError(f'invalid side to move {side!r}')
+        is_white_turn = side == 'w'
+
+        castling_rights = None
+        if len(fields) > 2:
+            if not CASTLING_FIELD.fullmatch(fields[2]):
+                raise ValueError(f'invalid castling rights {fields[2]!r}')
+            castling_rights = fields[2].replace('-', '')
+
+        en_passant_square = None
+        if len(fields) > 3:
+            if not EN_PASSANT_FIELDS[is_white_turn].fullmatch(fields[3]):
+                raise ValueError(f'invalid en passant square {fields[3]!r}')
+            if fields[3] != '-':
+                en_passant_square = parse_square(fields[3])
+
+        halfmove_clock = parse_counter(fields, 4, 0, 0)
+        fullmove_number = parse_counter(fields, 5, 1, 1)
+    except ValueError as error:
+        raise ValueError(f'Invalid FEN {fen_code!r}: {error}') from None
+    return fields[0], is_white_turn, castling_rights, en_passant_square, halfmove_clock, fullmove_number
+
+def format_placement(fen_codes: 'list[str]') -> str:
+    # Fen codes of the 64 squares, None for empty ones
+    rows = []
+    for y in range(8):
+        row = ''
+        empty = 0
+        for fen_code in fen_codes[y * 8:y * 8 + 8]:
+            if fen_code is None:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            row += fen_code
+        if empty:
+            row += str(empty)
+        rows.append(row)
+    return '/'.join(rows)
+
+def format_fen(
+    placement: str,
+    is_white_turn: bool,
+    castling_rights: str,
+    en_passant_square: int,
+    halfmove_clock: int,
+    fullmove_number: int,
+) -> str:
+    en_passant = '-'
+    if en_passant_square is not None:
+        en_passant = to_code(*get_cell(en_passant_square))
+    side = 'w' if is_white_turn else 'b'
+    return f'{placement} {side} {castling_rights or "-"} {en_passant} {halfmove_clock} {fullmove_number}'
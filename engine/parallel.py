@@ -0,0 +1,143 @@
+import multiprocessing as mp
+import os
+import threading
+from typing import Callable
+
+from engine.bitboard import BitboardPosition
+from engine.search import MAX_DEPTH, Search
+from engine.statistics import SearchStatistics
+from engine.tablebase import Tablebases
+from engine.transposition import TranspositionTable
+
+# How often the parent checks should_stop while the workers search
+STOP_POLL_INTERVAL = 0.01
+# Depth skipping schedules of the helpers, as in Stockfish: a helper skips the depths where (depth + phase) // size
+# is odd. Every size and phase pair skips a different set of depths, and more helpers get longer skips
+SKIP_SCHEDULES = [(size, phase) for size in range(1, 9) for phase in range(2 * size)]
+
+# Set by the parent in every pool process
+shared_transposition_table: TranspositionTable = None
+stop_flag = None
+worker_tablebases: Tablebases = None
+
+
+def init_worker(transposition_table: TranspositionTable, stop, tablebase_directory: str):
+    global shared_transposition_table, stop_flag, worker_tablebases
+    shared_transposition_table = transposition_table
+    stop_flag = stop
+    if tablebase_directory is not None:
+        worker_tablebases = Tablebases(tablebase_directory)
+
+
+def run_worker(
+    fen: str,
+    time_limit: float,
+    max_depth: int,
+    worker_index: int,
+    generation: int,
+) -> 'tuple[int, float, int, SearchStatistics]':
+    shared_transposition_table.generation = generation
+    search = Search(BitboardPosition(fen), shared_transposition_table, lambda: stop_flag.value, worker_tablebases)
+    move, score, depth = search.iterative_deepening(time_limit, max_depth, get_skip_depth(worker_index))
+    return move, score, depth, search.statistics
+
+def get_skip_depth(worker_index: int) -> 'Callable[[int], bool]':
+    # The main worker searches every depth, each helper spreads over the depths with its own schedule
+    if worker_index == 0:
+        return None
+    size, phase = SKIP_SCHEDULES[(worker_index - 1) % len(SKIP_SCHEDULES)]
+    return lambda depth: (depth + phase) // size % 2 == 1
+
+def merge_iterations(statistics: 'list[SearchStatistics]') -> 'list[dict]':
+    # A depth is reached when the first worker completes it or a deeper one, with the nodes every worker had
+    # counted by its last iteration completed until then
+    iterations = [iteration for worker in statistics for iteration in worker.iterations]
+    merged = []
+    time_reached = float('inf')
+    for depth in sorted({iteration['depth'] for iteration in iterations}, reverse=True):
+        first = min((iteration for iteration in iterations if iteration['depth'] == depth), key=lambda iteration: iteration['time'])
+        time_reached = min(time_reached, first['time'])
+        nodes = sum(
+            max((iteration['nodes'] for iteration in worker.iterations if iteration['time'] <= time_reached), default=0)
+            for worker in statistics
+        )
+        merged.append({**first, 'time': time_reached, 'nodes': nodes})
+    return merged[::-1]
+
+
+class ParallelSearch:
+    def __init__(self, workers: int = None, transposition_table_mb: float = 64, tablebases: Tablebases = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.transposition_table = TranspositionTable(transposition_table_mb, self.workers > 1)
+        self.tablebases = tablebases
+        # Totals over every worker, with the statistics of the main worker
+        self.nodes = 0
+        self.iterations: list[dict] = []
+        self.statistics = SearchStatistics(True)
+        self.stop = None
+        self.pool = None
+
+        if self.workers > 1:
+            self.stop = mp.RawValue('b', 0)
+            tablebase_directory = None if tablebases is None else tablebases.directory
+            self.pool = mp.Pool(self.workers, init_worker, (self.transposition_table, self.stop, tablebase_directory))
+
+    def iterative_deepening(
+        self,
+        fen: str,
+        time_limit: float,
+        max_depth: int = MAX_DEPTH,
+        should_stop: 'Callable[[], bool]' = None,
+    ) -> 'tuple[int, float, int]':
+        self.transposition_table.new_search()
+
+        # A single worker searches in this process and gives reproducible results
+        if self.pool is None:
+            search = Search(BitboardPosition(fen), self.transposition_table, should_stop, self.tablebases)
+            result = search.iterative_deepening(time_limit, max_depth)
+            self.statistics = search.statistics
+            self.nodes = search.statistics.nodes
+            self.iterations = search.statistics.iterations
+            return result
+
+        # Lazy SMP: every worker searches the whole tree, sharing what it finds through the table
+        self.stop.value = 0
+        finished = threading.Event()
+
+        def stop_workers(_):
+            self.stop.value = 1
+            finished.set()
+
+        results = [
+            self.pool.apply_async(
+                run_worker,
+                (fen, time_limit, max_depth, worker_index, self.transposition_table.generation),
+                callback=stop_workers,
+                error_callback=stop_workers,
+            )
+            for worker_index in range(self.workers)
+        ]
+        while not finished.wait(STOP_POLL_INTERVAL):
+            if should_stop is not None and should_stop():
+                self.stop.value = 1
+        results = [result.get() for result in results]
+        statistics = [worker_statistics for _, _, _, worker_statistics in results]
+        self.statistics = statistics[0]
+        self.nodes = sum(worker_statistics.nodes for worker_statistics in statistics)
+        self.iterations = merge_iterations(statistics)
+
+        # The deepest completed iteration wins, the main worker breaks ties
+        move, score, depth, _ = max(
+            results,
+            key=lambda result: (result[0] is not None, result[2], result is results[0]),
+        )
+        return move, score, depth
+
+    def clear(self):
+        self.transposition_table.clear()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
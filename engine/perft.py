@@ -0,0 +1,111 @@
+import argparse
+import sys
+import time
+from contextlib import nullcontext
+from typing import Iterable, Iterator
+
+from engine.bitboard import BitboardPosition
+from engine.epd import read_epd
+from engine.position import START_FEN, Position
+from engine.profiler import Profiler
+from util.moves import move_to_uci
+
+# Reference positions with their known leaf counts from depth 1 upwards
+PERFT_SUITE = [
+    ('start', START_FEN, [20, 400, 8902, 197281, 4865609]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', [48, 2039, 97862, 4085603]),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191, 2812, 43238, 674624]),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', [6, 264, 9467, 422333]),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', [44, 1486, 62379, 2103487]),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10', [46, 2079, 89890, 3894594]),
+]
+
+BACKENDS = {
+    'bitboard': BitboardPosition,
+    'position': Position,
+}
+
+def perft(position: 'Position | BitboardPosition', depth: int) -> int:
+    if depth == 0:
+        return 1
+
+    moves = position.legal_moves()
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        position.move_piece(move)
+        nodes += perft(position, depth - 1)
+        position.undo_move_piece()
+    return nodes
+
+def divide(position: 'Position | BitboardPosition', depth: int) -> 'dict[str, int]':
+    counts = {}
+    for move in position.legal_moves():
+        position.move_piece(move)
+        counts[move_to_uci(move)] = perft(position, depth - 1)
+        position.undo_move_piece()
+    return counts
+
+def read_perft_suite(path: str) -> 'Iterator[tuple[str, str, list[int]]]':
+    # Perft EPD files give the counts as D1, D2, ... operations
+    for index, (position, operations) in enumerate(read_epd(path), 1):
+        counts = []
+        while f'D{len(counts) + 1}' in operations:
+            counts.append(int(operations[f'D{len(counts) + 1}'][0]))
+        yield operations.get('id', [f'#{index}'])[0], position.get_fen(), counts
+
+def run_suite(backend: str, max_depth: int, suite: 'Iterable[tuple[str, str, list[int]]]' = PERFT_SUITE) -> bool:
+    passed = True
+    for name, fen, expected_counts in suite:
+        for depth, expected in enumerate(expected_counts[:max_depth], 1):
+            start = time.perf_counter()
+            nodes = perft(BACKENDS[backend](fen), depth)
+            elapsed = time.perf_counter() - start
+            status = 'ok' if nodes == expected else f'FAIL expected {expected}'
+            passed &= nodes == expected
+            print(f'{name:<10} depth {depth}  {nodes:>9} nodes  {elapsed:7.2f}s  {nodes / max(elapsed, 1e-9):>9.0f} nps  {status}')
+    return passed
+
+def main(args: 'list[str]' = None) -> int:
+    parser = argparse.ArgumentParser(description='Count move paths to check and time move generation.')
+    parser.add_argument('depth', type=int, help='depth to enumerate, or the maximum depth with --suite')
+    parser.add_argument('--fen', default=START_FEN)
+    parser.add_argument('--backend', choices=BACKENDS, default='bitboard')
+    parser.add_argument('--divide', action='store_true', help='print the count below each root move')
+    parser.add_argument('--suite', action='store_true', help='check the reference positions against known counts')
+    parser.add_argument('--epd', help='check the positions of a perft EPD file with D1, D2, ... counts instead')
+    parser.add_argument('--profile', action='store_true', help='print the time spent in the hot functions')
+    options = parser.parse_args(args)
+
+    with Profiler() if options.profile else nullcontext() as profiler:
+        status = run(options)
+    if profiler is not None:
+        print(profiler.get_report())
+    return status
+
+def run(options: argparse.Namespace) -> int:
+    if options.epd is not None:
+        return 0 if run_suite(options.backend, options.depth, read_perft_suite(options.epd)) else 1
+    if options.suite:
+        return 0 if run_suite(options.backend, options.depth) else 1
+
+    position = BACKENDS[options.backend](options.fen)
+    start = time.perf_counter()
+    if options.divide:
+        counts = divide(position, options.depth)
+        for move, nodes in sorted(counts.items()):
+            print(f'{move}: {nodes}')
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(position, options.depth)
+    elapsed = time.perf_counter() - start
+
+    print(f'Nodes: {nodes}')
+    print(f'Time: {elapsed:.2f}s')
+    print(f'Nodes/sec: {nodes / max(elapsed, 1e-9):.0f}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import re
+from typing import Callable, Iterator
+
+from engine.bitboard import BitboardPosition
+from engine.position import START_FEN, Position
+from pieces.piece_code import PieceCode
+from util.moves import CASTLE, EAT, get_cell, get_from_square, get_promotion, get_to_square, parse_square
+from util.utils import to_code
+
+# Tags every game carries, in the order they are written, with the values written when they are unknown
+SEVEN_TAG_ROSTER = {
+    'Event': '?',
+    'Site': '?',
+    'Date': '????.??.??',
+    'Round': '?',
+    'White': '?',
+    'Black': '?',
+    'Result': '*',
+}
+RESULTS = ['1-0', '0-1', '1/2-1/2', '*']
+LINE_WIDTH = 80
+
+SAN_PATTERN = re.compile(r'([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?')
+CASTLING_SANS = {'O-O': 6, 'O-O-O': 2, '0-0': 6, '0-0-0': 2}
+HEADER_PATTERN = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# Comments, variations, annotation glyphs, move numbers, results and moves
+MOVETEXT_TOKEN = re.compile(r'\{[^}]*\}?|;.*|\(|\)|\$\d+|1-0|0-1|1/2-1/2|\*|\d+\.+|[^\s{}();$]+')
+MOVE_NUMBER = re.compile(r'\d+\.*')
+
+def move_to_san(position: 'Position | BitboardPosition', move: int) -> str:
+    from_square, to_square = get_from_square(move), get_to_square(move)
+    if move & CASTLE:
+        san = 'O-O' if to_square & 7 == 6 else 'O-O-O'
+    else:
+        fen_code = position.get_fen_code(from_square)
+        target = to_code(*get_cell(to_square))
+        from_code = to_code(*get_cell(from_square))
+        if fen_code.upper() == PieceCode.PAWN:
+            san = f'{from_code[0]}x{target}' if move & EAT else target
+        else:
+            # Other pieces of the same kind able to reach the same square
+            rivals = [
+                get_from_square(other)
+                for other in position.legal_moves()
+                if get_to_square(other) == to_square
+                and get_from_square(other) != from_square
+                and position.get_fen_code(get_from_square(other)) == fen_code
+            ]
+            disambiguation = ''
+            if rivals:
+                if all(rival & 7 != from_square & 7 for rival in rivals):
+                    disambiguation = from_code[0]
+                elif all(rival >> 3 != from_square >> 3 for rival in rivals):
+                    disambiguation = from_code[1]
+                else:
+                    disambiguation = from_code
+            san = fen_code.upper() + disambiguation + ('x' if move & EAT else '') + target
+
+        promotion = get_promotion(move)
+        if promotion is not None:
+            san += f'={promotion}'
+
+    position.move_piece(move)
+    if position.player_is_checked(position.is_white_turn):
+        san += '+' if position.has_any_legal_move() else '#'
+    position.undo_move_piece()
+    return san
+
+def san_to_move(position: 'Position | BitboardPosition', san: str) -> int:
+    code = san.rstrip('+#!?')
+    moves = position.legal_moves()
+    if code in CASTLING_SANS:
+        candidates = [move for move in moves if move & CASTLE and get_to_square(move) & 7 == CASTLING_SANS[code]]
+    else:
+        match = SAN_PATTERN.fullmatch(code)
+        if match is None:
+            raise ValueError(f'Invalid SAN {san!r}')
+
+        piece, from_file, from_rank, target, promotion = match.groups()
+        piece = piece or PieceCode.PAWN
+        to_square = parse_square(target)
+        candidates = []
+        for move in moves:
+            from_code = to_code(*get_cell(get_from_square(move)))
+            if (
+                get_to_square(move) == to_square
+                and position.get_fen_code(get_from_square(move)).upper() == piece
+                and from_file in (None, from_code[0])
+                and from_rank in (None, from_code[1])
+                and get_promotion(move) == promotion
+            ):
+                candidates.append(move)
+
+    if len(candidates) != 1:
+        raise ValueError(f"{'Ambiguous' if candidates else 'Illegal'} move {san!r} in {position.get_fen()}")
+    return candidates[0]
+
+def get_result(position: 'Position | BitboardPosition') -> str:
+    if position.has_any_legal_move():
+        return '*'
+    if position.player_is_checked(position.is_white_turn):
+        return '0-1' if position.is_white_turn else '1-0'
+    return '1/2-1/2'
+
+def escape_tag(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+def format_pgn(headers: 'dict[str, str]', moves: 'list[int]', start_fen: str = START_FEN) -> str:
+    position = BitboardPosition(start_fen)
+    # Move numbers stay on the same line as their move
+    tokens = []
+    for move in moves:
+        san = move_to_san(position, move)
+        if position.is_white_turn:
+            san = f'{position.fullmove_number}. {san}'
+        elif not tokens:
+            san = f'{position.fullmove_number}... {san}'
+        tokens.append(san)
+        position.move_piece(move)
+
+    headers = {**SEVEN_TAG_ROSTER, 'Result': get_result(position), **headers}
+    if start_fen != START_FEN:
+        headers['SetUp'] = '1'
+        headers['FEN'] = start_fen
+    tokens.append(headers['Result'])
+
+    lines = [f'[{name} "{escape_tag(value)}"]' for name, value in headers.items()]
+    lines.append('')
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+def write_pgn(path: str, headers: 'dict[str, str]', moves: 'list[int]', start_fen: str = START_FEN):
+    with open(path, 'a') as file:
+        file.write(format_pgn(headers, moves, start_fen) + '\n')
+
+def read_game(
+    headers: 'dict[str, str]',
+    sans: 'list[str]',
+    position_class: 'type[Position | BitboardPosition]',
+) -> 'tuple[dict[str, str], list[int], Position | BitboardPosition]':
+    position = position_class(headers.get('FEN', START_FEN))
+    moves = []
+    for san in sans:
+        move = san_to_move(position, san)
+        position.move_piece(move)
+        moves.append(move)
+    return headers, moves, position
+
+def read_pgn(
+    path: str,
+    position_class: 'type[Position | BitboardPosition]' = BitboardPosition,
+    on_error: 'Callable[[ValueError], None]' = None,
+) -> 'Iterator[tuple[dict[str, str], list[int], Position | BitboardPosition]]':
+    # Games are replayed as soon as their last line is read, so only one game is held in memory at a time.
+    # Malformed games raise, or are passed to on_error and skipped so the games after them are still read
+    headers: dict[str, str] = {}
+    sans: list[str] = []
+    is_in_comment = False
+    depth = 0
+    first_line = 1
+
+    def report(error: ValueError):
+        error = ValueError(f'{path}:{first_line}: {error}')
+        if on_error is None:
+            raise error from None
+        on_error(error)
+
+    def finish_game() -> 'Iterator[tuple[dict[str, str], list[int], Position | BitboardPosition]]':
+        try:
+            game = read_game(headers, sans, position_class)
+        except ValueError as error:
+            report(error)
+            return
+        yield game
+
+    with open(path, encoding='utf-8', errors='replace') as file:
+        for line_number, line in enumerate(file, 1):
+            if (is_in_comment or depth) and line.startswith('[Event '):
+                # An unclosed comment or variation ends where the next game starts
+                report(ValueError('unclosed comment or variation'))
+                headers, sans = {}, []
+                is_in_comment, depth = False, 0
+
+            if is_in_comment:
+                end = line.find('}')
+                if end < 0:
+                    continue
+                line = line[end + 1:]
+                is_in_comment = False
+
+            stripped = line.strip()
+            if not stripped or stripped.startswith('%'):
+                continue
+            if stripped.startswith('[') and depth == 0:
+                # Tags after moves without a result start the next game
+                if sans:
+                    yield from finish_game()
+                    headers, sans = {}, []
+                if not headers:
+                    first_line = line_number
+                match = HEADER_PATTERN.match(stripped)
+                if match is not None:
+                    headers[match.group(1)] = re.sub(r'\\(.)', r'\1', match.group(2))
+                continue
+
+            if not headers and not sans:
+                first_line = line_number
+            for match in MOVETEXT_TOKEN.finditer(line):
+                token = match.group()
+                if token.startswith('{'):
+                    is_in_comment = not token.endswith('}')
+                elif token.startswith(';'):
+                    break
+                elif token == '(':
+                    depth += 1
+                elif token == ')':
+                    depth = max(depth - 1, 0)
+                elif depth or token.startswith('$') or MOVE_NUMBER.fullmatch(token):
+                    continue
+                elif token in RESULTS:
+                    headers.setdefault('Result', token)
+                    yield from finish_game()
+                    headers, sans = {}, []
+                else:
+                    sans.append(token)
+
+    if headers or sans:
+        yield from finish_game()
@@ -0,0 +1,516 @@
+from typing import Iterator
+
+from pieces.piece import Piece
+from pieces.piece_code import PieceCode
+from pieces.piece_factory import PieceFactory
+from util.moves import CASTLE, EAT, EN_PASSANT, PROMOTE, encode_move, get_cell, get_from_square, get_promotion, get_square, get_to_square
+from engine.fen import format_fen, format_placement, parse_fen
+from engine.zobrist import BLACK_TO_MOVE_KEY, EN_PASSANT_KEYS, PIECE_KEYS, get_castling_key
+from util.utils import is_inside_board, is_king, is_pawn
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# Castling right -> (king from, rookie from, king to, rookie to)
+CASTLINGS = {
+    PieceCode.KING: ((4, 7), (7, 7), (6, 7), (5, 7)),
+    PieceCode.QUEEN: ((4, 7), (0, 7), (2, 7), (3, 7)),
+    PieceCode.KING.lower(): ((4, 0), (7, 0), (6, 0), (5, 0)),
+    PieceCode.QUEEN.lower(): ((4, 0), (0, 0), (2, 0), (3, 0)),
+}
+
+KNIGHT_DIRECTIONS = [(1, 2), (1, -2), (-1, 2), (-1, -2), (2, 1), (2, -1), (-2, 1), (-2, -1)]
+KING_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+ROOKIE_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+# Fen codes of the pieces able to attack along each kind of line, indexed by [is_white]
+ATTACKER_CODES = [
+    {code: code.lower() for code in (PieceCode.PAWN, PieceCode.KNIGHT, PieceCode.KING)},
+    {code: code for code in (PieceCode.PAWN, PieceCode.KNIGHT, PieceCode.KING)},
+]
+ROOKIE_ATTACKERS = [(PieceCode.ROOKIE.lower(), PieceCode.QUEEN.lower()), (PieceCode.ROOKIE, PieceCode.QUEEN)]
+BISHOP_ATTACKERS = [(PieceCode.BISHOP.lower(), PieceCode.QUEEN.lower()), (PieceCode.BISHOP, PieceCode.QUEEN)]
+
+class Position:
+    def __init__(self, fen_code: str = START_FEN):
+        placement, self.is_white_turn, castling_rights, self.en_passant_square, self.halfmove_clock, self.fullmove_number = (
+            parse_fen(fen_code)
+        )
+        self.board: list[list[Piece]] = self.setup_board(placement)
+
+        # Rights whose king or rookie has left its square are dropped
+        possible_rights = self.infer_castling_rights()
+        if castling_rights is None:
+            castling_rights = possible_rights
+        self.castling_rights = ''.join(right for right in castling_rights if right in possible_rights)
+
+        self.king_cells = {True: self.find_king_cell(True), False: self.find_king_cell(False)}
+        self.score = self.compute_score()
+        self.hash = self.compute_hash()
+        self.history = []
+
+    def setup_board(self, fen_code: str) -> 'list[list[Piece]]':
+        board = []
+        for row in fen_code.split('/'):
+            board_row = []
+            for item in row:
+                if item.isdigit():
+                    board_row.extend([None] * int(item))
+                else:
+                    board_row.append(PieceFactory.create(item))
+            board.append(board_row)
+        return board
+
+    def infer_castling_rights(self) -> str:
+        castling_rights = ''
+        for right, (king_cell, rookie_cell, _, _) in CASTLINGS.items():
+            king, rookie = self.at(king_cell), self.at(rookie_cell)
+            is_white = right.isupper()
+            if king is None or king.get_fen_code() != (PieceCode.KING if is_white else PieceCode.KING.lower()):
+                continue
+            if rookie is None or rookie.get_fen_code() != (PieceCode.ROOKIE if is_white else PieceCode.ROOKIE.lower()):
+                continue
+            castling_rights += right
+        return castling_rights
+
+    def get_fen(self) -> str:
+        return format_fen(
+            format_placement([self.get_fen_code(square) for square in range(64)]),
+            self.is_white_turn,
+            self.castling_rights,
+            self.en_passant_square,
+            self.halfmove_clock,
+            self.fullmove_number,
+        )
+
+    def at(self, cell: 'tuple[int, int]') -> Piece:
+        x, y = cell
+        if self.is_inside(x, y):
+            return self.board[y][x]
+        return None
+
+    def is_inside(self, x: int, y: int) -> bool:
+        return is_inside_board(self.board, x, y)
+
+    def get_pieces(self, is_white: bool) -> 'list[tuple[Piece, tuple[int, int]]]':
+        pieces = []
+        for i, row in enumerate(self.board):
+            for j, piece in enumerate(row):
+                if piece is not None and piece.is_white == is_white:
+                    pieces.append((piece, (j, i)))
+        return pieces
+
+    def get_fen_code(self, square: int) -> str:
+        x, y = get_cell(square)
+        piece = self.board[y][x]
+        if piece is None:
+            return None
+        return piece.get_fen_code()
+
+    def get_piece_cell(self, piece: Piece) -> 'tuple[int, int]':
+        if piece is None:
+            return None
+
+        for i, row in enumerate(self.board):
+            for j, item in enumerate(row):
+                if item == piece:
+                    return (j, i)
+        return None
+
+    def get_king_cell(self, is_white: bool) -> 'tuple[int, int]':
+        return self.king_cells[is_white]
+
+    def find_king_cell(self, is_white: bool) -> 'tuple[int, int]':
+        for i, row in enumerate(self.board):
+            for j, piece in enumerate(row):
+                if piece is not None and piece.is_white == is_white and is_king(piece):
+                    return (j, i)
+        return None
+
+    def get_valid_movements(self, cell: 'tuple[int, int]') -> 'list[int]':
+        piece = self.at(cell)
+        if piece is None:
+            return []
+
+        movements = piece.get_valid_movements(self.board, cell)
+        if is_king(piece):
+            movements.extend(self.get_castling_movements(piece, cell))
+        elif is_pawn(piece):
+            movements.extend(self.get_en_passant_movements(piece, cell))
+        return movements
+
+    def get_castling_movements(self, king: Piece, cell: 'tuple[int, int]') -> 'list[int]':
+        movements = []
+        for right in self.castling_rights:
+            if right.isupper() != king.is_white:
+                continue
+
+            king_cell, rookie_cell, king_to, _ = CASTLINGS[right]
+            if cell != king_cell:
+                continue
+
+            y = king_cell[1]
+            start_x, end_x = sorted((king_cell[0], rookie_cell[0]))
+            if any(self.board[y][x] is not None for x in range(start_x + 1, end_x)):
+                continue
+
+            start_x, end_x = sorted((king_cell[0], king_to[0]))
+            if not any(self.is_square_attacked(get_square(x, y), not king.is_white) for x in range(start_x, end_x + 1)):
+                movements.append(encode_move(get_square(cell[0], cell[1]), get_square(king_to[0], king_to[1]), CASTLE))
+        return movements
+
+    def get_en_passant_movements(self, pawn: Piece, cell: 'tuple[int, int]') -> 'list[int]':
+        if self.en_passant_square is None or pawn.is_white != self.is_white_turn:
+            return []
+
+        x, y = get_cell(self.en_passant_square)
+        if cell[1] != (y + 1 if pawn.is_white else y - 1) or abs(cell[0] - x) != 1:
+            return []
+        return [encode_move(get_square(cell[0], cell[1]), self.en_passant_square, EAT | EN_PASSANT)]
+
+    def get_legal_movements(self, cell: 'tuple[int, int]') -> 'list[int]':
+        square = get_square(cell[0], cell[1])
+        return [movement for movement in self.legal_moves() if get_from_square(movement) == square]
+
+    def legal_moves(self) -> 'list[int]':
+        return list(self.iterate_legal_moves())
+
+    def iterate_legal_moves(self) -> 'Iterator[int]':
+        # Moves are made piece by piece, so callers only asking whether one exists stop at the first
+        is_white = self.is_white_turn
+        king_cell = self.get_king_cell(is_white)
+        if king_cell is None:
+            yield from self.get_all_movements()
+            return
+
+        checkers = self.get_checkers(king_cell, not is_white)
+        check_squares = None
+        if len(checkers) == 1:
+            check_squares = self.get_check_squares(king_cell, checkers[0])
+        pins = self.get_pins(king_cell, is_white)
+
+        for piece, cell in self.get_pieces(is_white):
+            if cell == king_cell:
+                yield from self.get_king_movements(king_cell)
+                continue
+            if len(checkers) > 1:
+                continue
+
+            allowed_squares = pins.get(cell)
+            for movement in piece.get_valid_movements(self.board, cell):
+                to_square = get_to_square(movement)
+                if check_squares is not None and to_square not in check_squares:
+                    continue
+                if allowed_squares is not None and to_square not in allowed_squares:
+                    continue
+                yield movement
+
+            # Taking en passant empties two squares of a line, so it is simply tried
+            if is_pawn(piece):
+                for movement in self.get_en_passant_movements(piece, cell):
+                    if self.is_legal_movement(movement):
+                        yield movement
+
+    def is_legal_movement(self, movement: int) -> bool:
+        is_white = self.is_white_turn
+        self.move_piece(movement)
+        is_checked = self.player_is_checked(is_white)
+        self.undo_move_piece()
+        return not is_checked
+
+    def has_any_legal_move(self) -> bool:
+        return next(self.iterate_legal_moves(), None) is not None
+
+    def get_king_movements(self, king_cell: 'tuple[int, int]') -> 'list[int]':
+        x, y = king_cell
+        king = self.board[y][x]
+
+        # The king is lifted so sliders checking it also attack the squares behind it
+        self.board[y][x] = None
+        movements = [
+            movement for movement in king.get_valid_movements(self.board, king_cell)
+            if not self.is_square_attacked(get_to_square(movement), not king.is_white)
+        ]
+        self.board[y][x] = king
+
+        movements.extend(self.get_castling_movements(king, king_cell))
+        return movements
+
+    def get_checkers(self, king_cell: 'tuple[int, int]', by_white: bool) -> 'list[tuple[int, int]]':
+        board = self.board
+        x, y = king_cell
+        attacker_codes = ATTACKER_CODES[by_white]
+        checkers = []
+
+        pawn_y = y + 1 if by_white else y - 1
+        if 0 <= pawn_y < 8:
+            for pawn_x in (x - 1, x + 1):
+                if 0 <= pawn_x < 8:
+                    piece = board[pawn_y][pawn_x]
+                    if piece is not None and piece.get_fen_code() == attacker_codes[PieceCode.PAWN]:
+                        checkers.append((pawn_x, pawn_y))
+
+        for dx, dy in KNIGHT_DIRECTIONS:
+            attacker_x, attacker_y = x + dx, y + dy
+            if 0 <= attacker_x < 8 and 0 <= attacker_y < 8:
+                piece = board[attacker_y][attacker_x]
+                if piece is not None and piece.get_fen_code() == attacker_codes[PieceCode.KNIGHT]:
+                    checkers.append((attacker_x, attacker_y))
+
+        for sliders, directions in ((ROOKIE_ATTACKERS[by_white], ROOKIE_DIRECTIONS), (BISHOP_ATTACKERS[by_white], BISHOP_DIRECTIONS)):
+            for dx, dy in directions:
+                attacker_x, attacker_y = x + dx, y + dy
+                while 0 <= attacker_x < 8 and 0 <= attacker_y < 8:
+                    piece = board[attacker_y][attacker_x]
+                    if piece is not None:
+                        if piece.get_fen_code() in sliders:
+                            checkers.append((attacker_x, attacker_y))
+                        break
+                    attacker_x += dx
+                    attacker_y += dy
+        return checkers
+
+    def get_check_squares(self, king_cell: 'tuple[int, int]', checker_cell: 'tuple[int, int]') -> 'set[int]':
+        check_squares = {get_square(checker_cell[0], checker_cell[1])}
+
+        dx, dy = king_cell[0] - checker_cell[0], king_cell[1] - checker_cell[1]
+        if dx != 0 and dy != 0 and abs(dx) != abs(dy):
+            return check_squares
+
+        step_x, step_y = (dx > 0) - (dx < 0), (dy > 0) - (dy < 0)
+        x, y = checker_cell[0] + step_x, checker_cell[1] + step_y
+        while (x, y) != king_cell:
+            check_squares.add(get_square(x, y))
+            x += step_x
+            y += step_y
+        return check_squares
+
+    def get_pins(self, king_cell: 'tuple[int, int]', is_white: bool) -> 'dict[tuple[int, int], set[int]]':
+        board = self.board
+        pins = {}
+
+        for sliders, directions in ((ROOKIE_ATTACKERS[not is_white], ROOKIE_DIRECTIONS), (BISHOP_ATTACKERS[not is_white], BISHOP_DIRECTIONS)):
+            for dx, dy in directions:
+                ray = set()
+                pinned_cell = None
+                x, y = king_cell[0] + dx, king_cell[1] + dy
+                while 0 <= x < 8 and 0 <= y < 8:
+                    ray.add(get_square(x, y))
+                    piece = board[y][x]
+                    if piece is not None:
+                        if piece.is_white != is_white:
+                            if pinned_cell is not None and piece.get_fen_code() in sliders:
+                                pins[pinned_cell] = ray
+                            break
+                        if pinned_cell is not None:
+                            break
+                        pinned_cell = (x, y)
+                    x += dx
+                    y += dy
+        return pins
+
+    def get_all_movements(self) -> 'list[int]':
+        all_movements = []
+        for _, cell in self.get_pieces(self.is_white_turn):
+            all_movements.extend(self.get_valid_movements(cell))
+        return all_movements
+
+    def get_movement(self, cell: 'tuple[int, int]', clicked_cell: 'tuple[int, int]') -> int:
+        clicked_square = get_square(clicked_cell[0], clicked_cell[1])
+        for movement in self.get_legal_movements(cell):
+            if get_to_square(movement) == clicked_square:
+                return movement
+        return None
+
+    def move_piece(self, movement: int) -> Piece:
+        from_x, from_y = from_pos = get_cell(get_from_square(movement))
+        to_x, to_y = to_pos = get_cell(get_to_square(movement))
+
+        piece = self.board[from_y][from_x]
+        eaten_x, eaten_y = eaten_pos = (to_x, from_y) if movement & EN_PASSANT else to_pos
+        eaten_piece = self.board[eaten_y][eaten_x]
+        self.history.append((
+            movement, piece, eaten_piece, self.castling_rights, self.en_passant_square, self.halfmove_clock, self.score, self.hash,
+        ))
+        self.hash ^= self.get_en_passant_hash()
+
+        self.board[from_y][from_x] = None
+        self.board[eaten_y][eaten_x] = None
+        self.board[to_y][to_x] = piece
+        if is_king(piece):
+            self.king_cells[piece.is_white] = to_pos
+
+        from_square, to_square = get_from_square(movement), get_to_square(movement)
+        self.score -= self.get_piece_score(piece, from_pos)
+        self.hash ^= PIECE_KEYS[piece.get_fen_code()][from_square]
+        if eaten_piece is not None:
+            self.score -= self.get_piece_score(eaten_piece, eaten_pos)
+            self.hash ^= PIECE_KEYS[eaten_piece.get_fen_code()][get_square(eaten_x, eaten_y)]
+
+        if movement & CASTLE:
+            rookie_from, rookie_to = self.get_castling_rookie_cells(to_pos)
+            rookie = self.board[rookie_from[1]][rookie_from[0]]
+            self.board[rookie_to[1]][rookie_to[0]] = rookie
+            self.board[rookie_from[1]][rookie_from[0]] = None
+            self.score += self.get_piece_score(rookie, rookie_to) - self.get_piece_score(rookie, rookie_from)
+            rookie_keys = PIECE_KEYS[rookie.get_fen_code()]
+            self.hash ^= rookie_keys[get_square(rookie_from[0], rookie_from[1])] ^ rookie_keys[get_square(rookie_to[0], rookie_to[1])]
+        elif movement & PROMOTE:
+            fen_code = get_promotion(movement)
+            if not piece.is_white:
+                fen_code = fen_code.lower()
+            self.board[to_y][to_x] = PieceFactory.create(fen_code)
+
+        self.score += self.get_piece_score(self.board[to_y][to_x], to_pos)
+        self.hash ^= PIECE_KEYS[self.board[to_y][to_x].get_fen_code()][to_square]
+
+        castling_rights = self.update_castling_rights(from_pos, to_pos)
+        if castling_rights != self.castling_rights:
+            self.hash ^= get_castling_key(self.castling_rights) ^ get_castling_key(castling_rights)
+            self.castling_rights = castling_rights
+
+        self.en_passant_square = None
+        if is_pawn(piece) and abs(to_y - from_y) == 2:
+            self.en_passant_square = get_square(from_x, (from_y + to_y) // 2)
+
+        self.halfmove_clock = 0 if eaten_piece is not None or is_pawn(piece) else self.halfmove_clock + 1
+        if not self.is_white_turn:
+            self.fullmove_number += 1
+        self.hash ^= BLACK_TO_MOVE_KEY
+        self.is_white_turn = not self.is_white_turn
+        self.hash ^= self.get_en_passant_hash()
+        return eaten_piece
+
+    def undo_move_piece(self):
+        movement, piece, eaten_piece, castling_rights, en_passant_square, halfmove_clock, score, key = self.history.pop()
+        from_x, from_y = get_cell(get_from_square(movement))
+        to_x, to_y = to_pos = get_cell(get_to_square(movement))
+
+        self.board[from_y][from_x] = piece
+        if movement & EN_PASSANT:
+            self.board[to_y][to_x] = None
+            self.board[from_y][to_x] = eaten_piece
+        else:
+            self.board[to_y][to_x] = eaten_piece
+        if is_king(piece):
+            self.king_cells[piece.is_white] = (from_x, from_y)
+
+        if movement & CASTLE:
+            rookie_from, rookie_to = self.get_castling_rookie_cells(to_pos)
+            self.board[rookie_from[1]][rookie_from[0]] = self.board[rookie_to[1]][rookie_to[0]]
+            self.board[rookie_to[1]][rookie_to[0]] = None
+
+        self.castling_rights = castling_rights
+        self.en_passant_square = en_passant_square
+        self.halfmove_clock = halfmove_clock
+        self.score = score
+        self.hash = key
+        self.is_white_turn = not self.is_white_turn
+        if not self.is_white_turn:
+            self.fullmove_number -= 1
+
+    def get_castling_rookie_cells(self, king_to: 'tuple[int, int]') -> 'tuple[tuple[int, int], tuple[int, int]]':
+        for _, rookie_from, castling_king_to, rookie_to in CASTLINGS.values():
+            if castling_king_to == king_to:
+                return rookie_from, rookie_to
+        return None
+
+    def update_castling_rights(self, from_pos: 'tuple[int, int]', to_pos: 'tuple[int, int]') -> str:
+        castling_rights = self.castling_rights
+        for right in self.castling_rights:
+            king_cell, rookie_cell, _, _ = CASTLINGS[right]
+            if from_pos in (king_cell, rookie_cell) or to_pos == rookie_cell:
+                castling_rights = castling_rights.replace(right, '')
+        return castling_rights
+
+    def player_is_checked(self, is_white: bool) -> bool:
+        king_cell = self.get_king_cell(is_white)
+        if king_cell is None:
+            return False
+        return self.is_square_attacked(get_square(king_cell[0], king_cell[1]), not is_white)
+
+    def is_square_attacked(self, square: int, by_white: bool) -> bool:
+        board = self.board
+        x, y = get_cell(square)
+        attacker_codes = ATTACKER_CODES[by_white]
+
+        pawn_y = y + 1 if by_white else y - 1
+        if 0 <= pawn_y < 8:
+            for pawn_x in (x - 1, x + 1):
+                if 0 <= pawn_x < 8:
+                    piece = board[pawn_y][pawn_x]
+                    if piece is not None and piece.get_fen_code() == attacker_codes[PieceCode.PAWN]:
+                        return True
+
+        for code, directions in ((PieceCode.KNIGHT, KNIGHT_DIRECTIONS), (PieceCode.KING, KING_DIRECTIONS)):
+            for dx, dy in directions:
+                attacker_x, attacker_y = x + dx, y + dy
+                if 0 <= attacker_x < 8 and 0 <= attacker_y < 8:
+                    piece = board[attacker_y][attacker_x]
+                    if piece is not None and piece.get_fen_code() == attacker_codes[code]:
+                        return True
+
+        for sliders, directions in ((ROOKIE_ATTACKERS[by_white], ROOKIE_DIRECTIONS), (BISHOP_ATTACKERS[by_white], BISHOP_DIRECTIONS)):
+            for dx, dy in directions:
+                attacker_x, attacker_y = x + dx, y + dy
+                while 0 <= attacker_x < 8 and 0 <= attacker_y < 8:
+                    piece = board[attacker_y][attacker_x]
+                    if piece is not None:
+                        if piece.get_fen_code() in sliders:
+                            return True
+                        break
+                    attacker_x += dx
+                    attacker_y += dy
+        return False
+
+    def get_piece_count(self) -> int:
+        return sum(piece is not None for row in self.board for piece in row)
+
+    def check_game_result(self) -> 'tuple[bool, bool]':
+        is_checked = self.player_is_checked(self.is_white_turn)
+        is_stalemate = not self.has_any_legal_move()
+        return (is_checked and is_stalemate, is_stalemate)
+
+    def evaluate(self) -> float:
+        return self.score
+
+    def compute_score(self) -> float:
+        score = 0
+
+        for i, row in enumerate(self.board):
+            for j, piece in enumerate(row):
+                if piece is None:
+                    continue
+
+                score += self.get_piece_score(piece, (j, i))
+        return score
+
+    def compute_hash(self) -> int:
+        key = get_castling_key(self.castling_rights) ^ self.get_en_passant_hash()
+        if not self.is_white_turn:
+            key ^= BLACK_TO_MOVE_KEY
+
+        for i, row in enumerate(self.board):
+            for j, piece in enumerate(row):
+                if piece is not None:
+                    key ^= PIECE_KEYS[piece.get_fen_code()][get_square(j, i)]
+        return key
+
+    def get_en_passant_hash(self) -> int:
+        if self.en_passant_square is None:
+            return 0
+
+        # Only keyed when a pawn can take it, as in Polyglot hashes
+        x, y = get_cell(self.en_passant_square)
+        pawn_y = y + 1 if self.is_white_turn else y - 1
+        pawn_code = PieceCode.PAWN if self.is_white_turn else PieceCode.PAWN.lower()
+        for pawn_x in (x - 1, x + 1):
+            piece = self.at((pawn_x, pawn_y))
+            if piece is not None and piece.get_fen_code() == pawn_code:
+                return EN_PASSANT_KEYS[x]
+        return 0
+
+    def get_piece_score(self, piece: Piece, cell: 'tuple[int, int]') -> float:
+        if piece.is_white:
+            return -piece.score(cell)
+        return piece.score(cell)
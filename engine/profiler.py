@@ -0,0 +1,101 @@
+import functools
+import sys
+import time
+
+import util.utils
+from engine.bitboard import BitboardPosition
+from engine.position import Position
+from engine.search import Search
+from pieces.bishop import Bishop
+from pieces.king import King
+from pieces.knight import Knight
+from pieces.pawn import Pawn
+from pieces.queen import Queen
+from pieces.rookie import Rookie
+
+PIECE_CLASSES = [Pawn, Knight, Bishop, Rookie, Queen, King]
+
+# (owner, attribute) of every function timed while profiling is on
+PROFILED_FUNCTIONS = [
+    *[(piece_class, 'get_valid_movements') for piece_class in PIECE_CLASSES],
+    *[(piece_class, 'score') for piece_class in PIECE_CLASSES],
+    *[
+        (position_class, name)
+        for position_class in (Position, BitboardPosition)
+        for name in ('legal_moves', 'player_is_checked', 'is_square_attacked', 'move_piece', 'undo_move_piece', 'evaluate')
+    ],
+    (BitboardPosition, 'generate_movements'),
+    (Search, 'order_moves'),
+    (Search, 'probe'),
+    (util.utils, 'to_code'),
+]
+
+
+class Profiler:
+    def __init__(self, targets: 'list[tuple[object, str]]' = PROFILED_FUNCTIONS):
+        self.targets = targets
+        self.calls: dict[str, int] = {}
+        self.times: dict[str, float] = {}
+        self.originals: list[tuple[object, str, object]] = []
+
+    # Functions are only swapped for timed wrappers while enabled, so a disabled profiler costs nothing
+    def enable(self):
+        if self.originals:
+            return
+
+        for owner, name in self.targets:
+            original = getattr(owner, name)
+            label = f'{getattr(owner, "__name__", owner)}.{name}'
+            profiled = self.wrap(label, original)
+            if isinstance(owner, type):
+                self.originals.append((owner, name, owner.__dict__[name]))
+                setattr(owner, name, profiled)
+                continue
+
+            # Module functions are also bound under their name in every module importing them
+            for module in list(sys.modules.values()):
+                if getattr(module, name, None) is original:
+                    self.originals.append((module, name, original))
+                    setattr(module, name, profiled)
+
+    def disable(self):
+        for owner, name, original in reversed(self.originals):
+            setattr(owner, name, original)
+        self.originals = []
+
+    def reset(self):
+        self.calls.clear()
+        self.times.clear()
+
+    def wrap(self, label: str, function):
+        calls, times = self.calls, self.times
+        calls.setdefault(label, 0)
+        times.setdefault(label, 0.0)
+        perf_counter = time.perf_counter
+
+        @functools.wraps(function)
+        def profiled(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                times[label] += perf_counter() - start
+                calls[label] += 1
+        return profiled
+
+    def get_report(self) -> str:
+        # Times are inclusive, so callers also count the time of the profiled functions they call
+        lines = [f"{'function':<40} {'calls':>10} {'total s':>10} {'per call us':>12}"]
+        for label, total in sorted(self.times.items(), key=lambda item: item[1], reverse=True):
+            calls = self.calls[label]
+            if not calls:
+                continue
+            lines.append(f'{label:<40} {calls:>10} {total:>10.3f} {total / calls * 1e6:>12.2f}')
+        return '\n'.join(lines)
+
+    def __enter__(self) -> 'Profiler':
+        self.enable()
+        return self
+
+    def __exit__(self, *_):
+        self.disable()
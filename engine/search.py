@@ -0,0 +1,286 @@
+import time
+from typing import Callable
+
+from engine.bitboard import BitboardPosition
+from engine.position import Position
+from engine.statistics import SearchStatistics
+from engine.tablebase import Tablebases
+from engine.transposition import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
+from pieces.piece_code import PieceCode
+from util.moves import EAT, EN_PASSANT, PROMOTE
+
+MAX_DEPTH = 64
+TIME_CHECK_NODES = 1024
+INFINITY = float('inf')
+MATE_SCORE = 1000000
+MATE_BOUND = MATE_SCORE - 1000
+# Smaller than any difference between two evaluations
+NULL_WINDOW = 0.001
+
+# Piece ranks used to order captures by most valuable victim, least valuable attacker
+ORDERING_VALUES = {
+    PieceCode.PAWN: 1,
+    PieceCode.KNIGHT: 3,
+    PieceCode.BISHOP: 3,
+    PieceCode.ROOKIE: 5,
+    PieceCode.QUEEN: 9,
+    PieceCode.KING: 100,
+}
+HASH_MOVE_ORDER = 1 << 30
+CAPTURE_ORDER = 1 << 29
+KILLER_ORDER = 1 << 28
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Search:
+    def __init__(
+        self,
+        position: 'Position | BitboardPosition',
+        transposition_table: TranspositionTable = None,
+        should_stop: 'Callable[[], bool]' = None,
+        tablebases: Tablebases = None,
+    ):
+        self.position = position
+        self.transposition_table = transposition_table
+        self.should_stop = should_stop
+        self.tablebases = tablebases
+        self.statistics = SearchStatistics(transposition_table is not None)
+        self.root_depth = 0
+        self.deadline = None
+        self.best_move = None
+        self.killers: dict[int, list[int]] = {}
+        self.history = [0] * 4096
+        # Best line found below each ply, rebuilt as the search unwinds
+        self.principal_variations: list[list[int]] = [[] for _ in range(MAX_DEPTH + 2)]
+
+    def iterative_deepening(
+        self,
+        time_limit: float,
+        max_depth: int = MAX_DEPTH,
+        skip_depth: 'Callable[[int], bool]' = None,
+    ) -> 'tuple[int, float, int]':
+        start = time.perf_counter()
+        self.deadline = start + time_limit
+        self.statistics = SearchStatistics(self.transposition_table is not None)
+        self.best_move = None
+        best_score = None
+        depth_reached = 0
+        # Every move of a tablebase position already scores exactly at depth 1
+        is_in_tablebases = self.probe_tablebases(0) is not None
+
+        for depth in range(1, max_depth + 1):
+            # Helpers of a parallel search leave some depths to the others, but all of them search the last one
+            if skip_depth is not None and depth < max_depth and skip_depth(depth):
+                continue
+            try:
+                move, score = self.search(depth)
+            except SearchTimeout:
+                break
+
+            self.best_move, best_score, depth_reached = move, score, depth
+            self.statistics.add_iteration(depth, time.perf_counter() - start, move, score, self.principal_variations[0])
+            if move is None or abs(score) > MATE_BOUND or is_in_tablebases:
+                break
+
+        self.deadline = None
+        return self.best_move, best_score, depth_reached
+
+    def search(self, depth: int) -> 'tuple[int, float]':
+        self.root_depth = depth
+        return self.negamax(depth, -INFINITY, INFINITY)
+
+    def negamax(self, depth: int, alpha: float, beta: float) -> 'tuple[int, float]':
+        ply = self.root_depth - depth
+        self.principal_variations[ply] = []
+        if depth == 0:
+            return None, self.quiescence(alpha, beta, ply)
+
+        self.count_node()
+        if ply > 0:
+            tablebase_score = self.probe_tablebases(ply)
+            if tablebase_score is not None:
+                return None, tablebase_score
+
+        original_alpha = alpha
+        hash_move, alpha, beta, hash_score = self.probe(depth, alpha, beta, ply)
+        # The root always searches so that it has a move to return
+        if hash_score is not None and ply > 0:
+            return hash_move, hash_score
+
+        moves = self.position.legal_moves()
+        if not moves:
+            return None, self.get_terminal_score(ply)
+
+        best_move = None
+        best_score = -INFINITY
+
+        for i, move in enumerate(self.order_moves(moves, hash_move, depth)):
+            self.position.move_piece(move)
+            if i == 0:
+                score = -self.negamax(depth - 1, -beta, -alpha)[1]
+            else:
+                score = -self.negamax(depth - 1, -alpha - NULL_WINDOW, -alpha)[1]
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, -beta, -score)[1]
+            self.position.undo_move_piece()
+
+            if score > best_score:
+                best_move = move
+                best_score = score
+                if score > alpha:
+                    self.principal_variations[ply] = [move] + self.principal_variations[ply + 1]
+            alpha = max(alpha, score)
+
+            if alpha >= beta:
+                self.statistics.cutoffs += 1
+                if i == 0:
+                    self.statistics.first_move_cutoffs += 1
+                self.update_quiet_move(move, depth)
+                break
+
+        self.store(depth, original_alpha, beta, best_move, best_score, ply)
+        return best_move, best_score
+
+    def quiescence(self, alpha: float, beta: float, ply: int) -> float:
+        self.count_node()
+        self.statistics.quiescence_nodes += 1
+        tablebase_score = self.probe_tablebases(ply)
+        if tablebase_score is not None:
+            return tablebase_score
+
+        is_checked = self.position.player_is_checked(self.position.is_white_turn)
+        moves = self.position.legal_moves()
+        if is_checked:
+            if not moves:
+                return self.get_terminal_score(ply)
+            best_score = -INFINITY
+        else:
+            best_score = self.evaluate()
+            if best_score >= beta:
+                return best_score
+            alpha = max(alpha, best_score)
+            moves = [move for move in moves if move & (EAT | PROMOTE)]
+
+        for move in self.order_moves(moves, None, None):
+            self.position.move_piece(move)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            self.position.undo_move_piece()
+
+            if score > best_score:
+                best_score = score
+            if score >= beta:
+                break
+            alpha = max(alpha, score)
+        return best_score
+
+    def evaluate(self) -> float:
+        if self.position.is_white_turn:
+            return -self.position.evaluate()
+        return self.position.evaluate()
+
+    def probe_tablebases(self, ply: int) -> float:
+        if self.tablebases is None:
+            return None
+        entry = self.tablebases.probe(self.position)
+        if entry is None:
+            return None
+        result, plies = entry
+        return result * (MATE_SCORE - ply - plies)
+
+    def get_terminal_score(self, ply: int) -> float:
+        if self.position.player_is_checked(self.position.is_white_turn):
+            return -(MATE_SCORE - ply)
+        return 0
+
+    def count_node(self):
+        statistics = self.statistics
+        statistics.nodes += 1
+        if statistics.nodes % TIME_CHECK_NODES != 0:
+            return
+        if self.should_stop is not None and self.should_stop():
+            raise SearchTimeout()
+        # The first iteration always completes so there is a move to play
+        if self.deadline is not None and self.best_move is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    def probe(self, depth: int, alpha: float, beta: float, ply: int) -> 'tuple[int, float, float, float]':
+        if self.transposition_table is None:
+            return None, alpha, beta, None
+
+        entry = self.transposition_table.probe(self.position.hash)
+        self.statistics.transposition_probes += 1
+        if entry is None:
+            return None, alpha, beta, None
+        self.statistics.transposition_hits += 1
+
+        entry_depth, bound, score, move = entry
+        if entry_depth >= depth:
+            # Mate scores are stored relative to the node, not to the root
+            if score > MATE_BOUND:
+                score -= ply
+            elif score < -MATE_BOUND:
+                score += ply
+
+            if bound == EXACT:
+                return move, alpha, beta, score
+            if bound == LOWER_BOUND:
+                alpha = max(alpha, score)
+            elif bound == UPPER_BOUND:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return move, alpha, beta, score
+        return move, alpha, beta, None
+
+    def store(self, depth: int, alpha: float, beta: float, move: int, score: float, ply: int):
+        if self.transposition_table is None:
+            return
+
+        if score <= alpha:
+            bound = UPPER_BOUND
+        elif score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+
+        if score > MATE_BOUND:
+            score += ply
+        elif score < -MATE_BOUND:
+            score -= ply
+        self.transposition_table.store(self.position.hash, depth, bound, score, move)
+
+    def order_moves(self, moves: 'list[int]', hash_move: int, depth: int) -> 'list[int]':
+        if depth == self.root_depth and self.best_move is not None:
+            hash_move = self.best_move
+        killers = self.killers.get(self.root_depth - depth, ()) if depth is not None else ()
+        position = self.position
+        history = self.history
+
+        def get_order(move: int) -> int:
+            if move == hash_move:
+                return HASH_MOVE_ORDER
+            if move & EAT:
+                if move & EN_PASSANT:
+                    victim = ORDERING_VALUES[PieceCode.PAWN]
+                else:
+                    victim = ORDERING_VALUES[position.get_fen_code(move >> 6 & 63).upper()]
+                attacker = ORDERING_VALUES[position.get_fen_code(move & 63).upper()]
+                return CAPTURE_ORDER + victim * 128 - attacker
+            if move in killers:
+                return KILLER_ORDER
+            return history[move & 4095]
+
+        moves.sort(key=get_order, reverse=True)
+        return moves
+
+    def update_quiet_move(self, move: int, depth: int):
+        if move & (EAT | PROMOTE):
+            return
+
+        killers = self.killers.setdefault(self.root_depth - depth, [None, None])
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[move & 4095] += depth * depth
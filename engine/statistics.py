@@ -0,0 +1,96 @@
+import json
+
+from util.moves import move_to_uci
+
+
+class SearchStatistics:
+    def __init__(self, has_transposition_table: bool = False):
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.transposition_probes = 0
+        self.transposition_hits = 0
+        self.has_transposition_table = has_transposition_table
+        self.depth = 0
+        self.time = 0.0
+        self.best_move: int = None
+        self.score: float = None
+        self.principal_variation: list[int] = []
+        # One dict per completed iteration with its depth, time, nodes, best move, score and principal variation
+        self.iterations: list[dict] = []
+
+    def add_iteration(self, depth: int, elapsed: float, move: int, score: float, principal_variation: 'list[int]'):
+        self.depth = depth
+        self.time = elapsed
+        self.best_move = move
+        self.score = score
+        self.principal_variation = principal_variation
+        self.iterations.append({
+            'depth': depth,
+            'time': elapsed,
+            'nodes': self.nodes,
+            'best_move': move,
+            'score': score,
+            'principal_variation': principal_variation,
+        })
+
+    def get_first_move_cutoff_rate(self) -> float:
+        if not self.cutoffs:
+            return None
+        return self.first_move_cutoffs / self.cutoffs
+
+    def get_effective_branching_factor(self) -> float:
+        # Growth of the work done by the last iteration over the one before it
+        if len(self.iterations) < 2:
+            return None
+        last_nodes = self.iterations[-1]['nodes'] - self.iterations[-2]['nodes']
+        previous_nodes = self.iterations[-2]['nodes'] - (self.iterations[-3]['nodes'] if len(self.iterations) > 2 else 0)
+        if not previous_nodes:
+            return None
+        return last_nodes / previous_nodes
+
+    def get_transposition_hit_rate(self) -> float:
+        if not self.has_transposition_table or not self.transposition_probes:
+            return None
+        return self.transposition_hits / self.transposition_probes
+
+    def to_dict(self) -> dict:
+        return {
+            'best_move': None if self.best_move is None else move_to_uci(self.best_move),
+            'score': self.score,
+            'depth': self.depth,
+            'time': self.time,
+            'nodes': self.nodes,
+            'quiescence_nodes': self.quiescence_nodes,
+            'nps': self.nodes / self.time if self.time else None,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoff_rate': self.get_first_move_cutoff_rate(),
+            'effective_branching_factor': self.get_effective_branching_factor(),
+            'transposition_hit_rate': self.get_transposition_hit_rate(),
+            'principal_variation': [move_to_uci(move) for move in self.principal_variation],
+            'iterations': [
+                {
+                    **iteration,
+                    'best_move': None if iteration['best_move'] is None else move_to_uci(iteration['best_move']),
+                    'principal_variation': [move_to_uci(move) for move in iteration['principal_variation']],
+                }
+                for iteration in self.iterations
+            ],
+        }
+
+    def write_json_line(self, path: str):
+        with open(path, 'a') as file:
+            file.write(json.dumps(self.to_dict()) + '\n')
+
+    def get_summary(self) -> str:
+        statistics = self.to_dict()
+        summary = (
+            f"{statistics['best_move']} score {self.score} depth {self.depth}"
+            f" nodes {self.nodes} ({self.quiescence_nodes} quiescence) in {self.time:.2f}s"
+        )
+        if self.cutoffs:
+            summary += f" first move cutoffs {statistics['first_move_cutoff_rate']:.0%}"
+        if statistics['transposition_hit_rate'] is not None:
+            summary += f" tt hits {statistics['transposition_hit_rate']:.0%}"
+        return summary + f" pv {' '.join(statistics['principal_variation'])}"
@@ -0,0 +1,380 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from engine.attacks import KING_ATTACKS, KNIGHT_ATTACKS, get_bishop_attacks, get_queen_attacks, get_rookie_attacks
+from engine.bitboard import PIECE_CODES, BitboardPosition
+from engine.position import Position
+from pieces.piece_code import PieceCode
+from util.moves import EAT, PROMOTE, get_cell, get_from_square, get_square, get_to_square
+
+TABLEBASE_DIRECTORY = 'tablebases'
+TABLEBASE_EXTENSION = '.tb'
+# Magic and piece count, followed by one byte per index
+HEADER = struct.Struct('>4sB3x')
+MAGIC = b'CTB1'
+MAX_PIECES = 4
+PIECE_ORDER = [PieceCode.KING, PieceCode.QUEEN, PieceCode.ROOKIE, PieceCode.BISHOP, PieceCode.KNIGHT, PieceCode.PAWN]
+PROMOTION_CODES = [PieceCode.QUEEN, PieceCode.ROOKIE, PieceCode.BISHOP, PieceCode.KNIGHT]
+EMPTY_FEN = '8/8/8/8/8/8/8/8 w - - 0 1'
+
+# Mirrors of the board as (flip files, flip ranks, swap files and ranks)
+SYMMETRIES = [(flip_x, flip_y, transpose) for flip_x in (False, True) for flip_y in (False, True) for transpose in (False, True)]
+SYMMETRY_SQUARES = {}
+for flip_x, flip_y, transpose in SYMMETRIES:
+    squares = []
+    for square in range(64):
+        x, y = get_cell(square)
+        x, y = 7 - x if flip_x else x, 7 - y if flip_y else y
+        squares.append(get_square(y, x) if transpose else get_square(x, y))
+    SYMMETRY_SQUARES[flip_x, flip_y, transpose] = squares
+
+# The white king is mirrored into the a8-d8-d5 triangle, or only onto the queen side once pawns fix the ranks
+KING_SQUARES = {
+    False: [get_square(x, y) for y in range(4) for x in range(y, 4)],
+    True: [get_square(x, y) for y in range(8) for x in range(4)],
+}
+KING_INDEXES = {has_pawns: {square: i for i, square in enumerate(squares)} for has_pawns, squares in KING_SQUARES.items()}
+# Mirrors taking each white king square into its region, a king on the diagonal has two
+KING_SYMMETRIES = {False: [], True: []}
+for square in range(64):
+    x, y = get_cell(square)
+    flip_x, flip_y = x > 3, y > 3
+    x, y = min(x, 7 - x), min(y, 7 - y)
+    KING_SYMMETRIES[True].append([(flip_x, False, False)])
+    KING_SYMMETRIES[False].append([(flip_x, flip_y, transpose) for transpose in {y > x, y >= x}])
+
+# Results for the side to move
+WIN, DRAW, LOSS = 1, 0, -1
+
+# A byte holds 0 for draws and unreachable indexes, otherwise 1 + the plies to mate:
+# odd plies win for the side to move, even plies lose
+def decode_value(value: int) -> 'tuple[int, int]':
+    if value == 0:
+        return DRAW, 0
+    plies = value - 1
+    return (WIN if plies & 1 else LOSS), plies
+
+def sort_codes(codes: 'list[str]') -> 'list[str]':
+    return sorted(codes, key=lambda code: PIECE_ORDER.index(code.upper()))
+
+def get_side_key(codes: 'list[str]') -> 'tuple[int, list[int]]':
+    return len(codes), [-PIECE_ORDER.index(code.upper()) for code in sort_codes(codes)]
+
+def get_signature(white_codes: 'list[str]', black_codes: 'list[str]') -> 'tuple[str, bool]':
+    # Tables are stored with the stronger side as white, the flag tells whether colours were swapped
+    is_flipped = get_side_key(white_codes) < get_side_key(black_codes)
+    if is_flipped:
+        white_codes, black_codes = black_codes, white_codes
+    white = ''.join(sort_codes(white_codes)).upper()
+    black = ''.join(sort_codes(black_codes)).upper()
+    return f'{white}v{black}', is_flipped
+
+def get_signature_codes(signature: str) -> 'list[str]':
+    white, black = signature.split('v')
+    return list(white) + list(black.lower())
+
+def get_table_size(piece_count: int, has_pawns: bool) -> int:
+    return 2 * len(KING_SQUARES[has_pawns]) << 6 * (piece_count - 1)
+
+def get_index(squares: 'list[int]', is_white: bool, has_pawns: bool) -> int:
+    # Side, white king region square, then the other squares; mirrored positions share the smallest index
+    king_indexes = KING_INDEXES[has_pawns]
+    side = 0 if is_white else len(king_indexes)
+    best_index = None
+    for symmetry in KING_SYMMETRIES[has_pawns][squares[0]]:
+        symmetry_squares = SYMMETRY_SQUARES[symmetry]
+        index = side + king_indexes[symmetry_squares[squares[0]]]
+        for square in squares[1:]:
+            index = index << 6 | symmetry_squares[square]
+        if best_index is None or index < best_index:
+            best_index = index
+    return best_index
+
+def get_squares(index: int, piece_count: int, has_pawns: bool) -> 'tuple[list[int], bool]':
+    king_squares = KING_SQUARES[has_pawns]
+    top = index >> 6 * (piece_count - 1)
+    squares = [king_squares[top % len(king_squares)]]
+    squares += [index >> 6 * (piece_count - 2 - i) & 63 for i in range(piece_count - 1)]
+    return squares, top < len(king_squares)
+
+
+class Tablebases:
+    def __init__(self, directory: str = TABLEBASE_DIRECTORY):
+        self.directory = directory
+        self.tables: dict[str, mmap.mmap] = {}
+        self.files = []
+        self.max_pieces = 2
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(TABLEBASE_EXTENSION):
+                    self.load(os.path.join(directory, name))
+
+    def load(self, path: str):
+        file = open(path, 'rb')
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, piece_count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a tablebase')
+
+        signature = os.path.basename(path)[:-len(TABLEBASE_EXTENSION)]
+        self.files.append(file)
+        self.tables[signature] = data
+        self.max_pieces = max(self.max_pieces, piece_count)
+
+    def probe(self, position: 'Position | BitboardPosition') -> 'tuple[int, int]':
+        piece_count = position.get_piece_count()
+        if piece_count > self.max_pieces:
+            return None
+        # Tables know nothing of castling or en passant, a square no pawn can take changes nothing
+        if position.castling_rights or position.get_en_passant_hash():
+            return None
+        if piece_count == 2:
+            return DRAW, 0
+
+        pieces = []
+        for square in range(64):
+            fen_code = position.get_fen_code(square)
+            if fen_code is not None:
+                pieces.append((fen_code, square))
+
+        white_codes = [fen_code for fen_code, _ in pieces if fen_code.isupper()]
+        black_codes = [fen_code for fen_code, _ in pieces if fen_code.islower()]
+        signature, is_flipped = get_signature(white_codes, black_codes)
+        data = self.tables.get(signature)
+        if data is None:
+            return None
+
+        is_white = position.is_white_turn
+        if is_flipped:
+            # Mirror the ranks and swap the colours so the position matches the stored side
+            pieces = [(fen_code.swapcase(), square ^ 56) for fen_code, square in pieces]
+            is_white = not is_white
+
+        pieces.sort(key=lambda piece: (piece[0].islower(), PIECE_ORDER.index(piece[0].upper())))
+        index = get_index([square for _, square in pieces], is_white, PieceCode.PAWN in signature)
+        return decode_value(data[HEADER.size + index])
+
+    def close(self):
+        for data in self.tables.values():
+            data.close()
+        for file in self.files:
+            file.close()
+        self.tables = {}
+        self.files = []
+
+
+def get_dependencies(signature: str) -> 'list[str]':
+    # Tables reached by a capture or a promotion
+    codes = get_signature_codes(signature)
+    dependencies = set()
+    for i, code in enumerate(codes):
+        rest = codes[:i] + codes[i + 1:]
+        if code.upper() != PieceCode.KING and len(rest) > 2:
+            dependencies.add(get_signature([c for c in rest if c.isupper()], [c for c in rest if c.islower()])[0])
+        if code.upper() == PieceCode.PAWN:
+            for promotion in PROMOTION_CODES:
+                promoted = rest + [promotion if code.isupper() else promotion.lower()]
+                dependencies.add(get_signature([c for c in promoted if c.isupper()], [c for c in promoted if c.islower()])[0])
+    return sorted(dependencies)
+
+def is_valid_placement(codes: 'list[str]', squares: 'list[int]') -> bool:
+    if len(set(squares)) != len(squares):
+        return False
+    for code, square in zip(codes, squares):
+        if code.upper() == PieceCode.PAWN and square >> 3 in (0, 7):
+            return False
+    return True
+
+def get_predecessors(
+    index: int,
+    codes: 'list[str]',
+    has_pawns: bool,
+    is_legal: bytearray,
+) -> 'set[int]':
+    # Legal indexes reaching this one by a quiet move of the side that just moved
+    squares, is_white = get_squares(index, len(codes), has_pawns)
+    occupied = 0
+    for square in squares:
+        occupied |= 1 << square
+
+    predecessors = set()
+    for slot, (code, square) in enumerate(zip(codes, squares)):
+        if code.isupper() == is_white:
+            continue
+
+        kind = code.upper()
+        if kind == PieceCode.PAWN:
+            # White pawns move towards the first row of squares
+            step = 8 if code.isupper() else -8
+            origins = 0
+            if not occupied >> square + step & 1:
+                origins = 1 << square + step
+                if square >> 3 == (4 if code.isupper() else 3) and not occupied >> square + 2 * step & 1:
+                    origins |= 1 << square + 2 * step
+        elif kind == PieceCode.KNIGHT:
+            origins = KNIGHT_ATTACKS[square] & ~occupied
+        elif kind == PieceCode.BISHOP:
+            origins = get_bishop_attacks(square, occupied) & ~occupied
+        elif kind == PieceCode.ROOKIE:
+            origins = get_rookie_attacks(square, occupied) & ~occupied
+        elif kind == PieceCode.QUEEN:
+            origins = get_queen_attacks(square, occupied) & ~occupied
+        else:
+            origins = KING_ATTACKS[square] & ~occupied
+
+        while origins:
+            bit = origins & -origins
+            origins ^= bit
+            moved_squares = squares.copy()
+            moved_squares[slot] = bit.bit_length() - 1
+            if is_valid_placement(codes, moved_squares):
+                predecessor = get_index(moved_squares, not is_white, has_pawns)
+                if is_legal[predecessor]:
+                    predecessors.add(predecessor)
+    return predecessors
+
+def generate_table(signature: str, tablebases: Tablebases) -> bytearray:
+    codes = get_signature_codes(signature)
+    pieces = [PIECE_CODES.index(code) for code in codes]
+    has_pawns = PieceCode.PAWN in signature
+    size = get_table_size(len(codes), has_pawns)
+    position = BitboardPosition(EMPTY_FEN)
+
+    values = bytearray(size)
+    is_legal = bytearray(size)
+    # Distinct successors of every index still to be proven winning for the opponent, a loss once none is left
+    remaining = array('H', bytes(2 * size))
+    losses: dict[int, list[int]] = {0: []}
+    wins: dict[int, list[int]] = {}
+    external_wins: dict[int, list[int]] = {}
+
+    # Forward pass: count the moves of every legal index, resolving captures and promotions from smaller tables
+    for index in range(size):
+        squares, is_white = get_squares(index, len(codes), has_pawns)
+        if not is_valid_placement(codes, squares) or get_index(squares, is_white, has_pawns) != index:
+            continue
+
+        for piece, square in zip(pieces, squares):
+            position.put_piece(piece, square)
+        position.is_white_turn = is_white
+
+        if not position.player_is_checked(not is_white):
+            is_legal[index] = 1
+            moves = position.legal_moves()
+            if not moves and position.player_is_checked(is_white):
+                losses[0].append(index)
+
+            slots = {square: slot for slot, square in enumerate(squares)}
+            successors = set()
+            external_moves = 0
+            for move in moves:
+                if move & (EAT | PROMOTE):
+                    external_moves += 1
+                    position.move_piece(move)
+                    result, plies = tablebases.probe(position)
+                    position.undo_move_piece()
+                    if result == LOSS:
+                        wins.setdefault(plies + 1, []).append(index)
+                    elif result == WIN:
+                        external_wins.setdefault(plies, []).append(index)
+                    continue
+
+                # A double push is looked up without its en passant square
+                moved_squares = squares.copy()
+                moved_squares[slots[get_from_square(move)]] = get_to_square(move)
+                successors.add(get_index(moved_squares, not is_white, has_pawns))
+            remaining[index] = len(successors) + external_moves
+
+        for piece, square in zip(pieces, squares):
+            position.remove_piece(piece, square)
+
+    def lose_move(index: int, plies: int):
+        remaining[index] -= 1
+        if remaining[index] == 0 and not values[index]:
+            losses.setdefault(plies + 1, []).append(index)
+
+    # Retrograde pass by increasing distance: a win takes the shortest mate, a loss the longest
+    plies = 0
+    while plies <= max([*losses, *wins, *external_wins], default=-1):
+        if plies + 1 > 0xFF:
+            raise ValueError(f'{signature} has mates too long to store')
+
+        for index in losses.pop(plies, []):
+            if values[index]:
+                continue
+            values[index] = plies + 1
+            for predecessor in get_predecessors(index, codes, has_pawns, is_legal):
+                if not values[predecessor]:
+                    wins.setdefault(plies + 1, []).append(predecessor)
+
+        for index in wins.pop(plies, []):
+            if values[index]:
+                continue
+            values[index] = plies + 1
+            for predecessor in get_predecessors(index, codes, has_pawns, is_legal):
+                lose_move(predecessor, plies)
+
+        for index in external_wins.pop(plies, []):
+            lose_move(index, plies)
+        plies += 1
+    return values
+
+def write_table(path: str, piece_count: int, values: bytearray):
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, piece_count))
+        file.write(values)
+
+def generate(signature: str, directory: str = TABLEBASE_DIRECTORY):
+    codes = get_signature_codes(signature)
+    signature, _ = get_signature([code for code in codes if code.isupper()], [code for code in codes if code.islower()])
+    path = os.path.join(directory, signature + TABLEBASE_EXTENSION)
+    if os.path.exists(path):
+        return
+    if codes.count(PieceCode.KING) != 1 or codes.count(PieceCode.KING.lower()) != 1 or len(codes) > MAX_PIECES:
+        raise ValueError(f'{signature} needs one king per side and at most {MAX_PIECES} pieces')
+
+    for dependency in get_dependencies(signature):
+        generate(dependency, directory)
+
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    tablebases = Tablebases(directory)
+    values = generate_table(signature, tablebases)
+    tablebases.close()
+    write_table(path, len(codes), values)
+    print(f'{signature}: {len(values)} indexes in {time.perf_counter() - start:.1f}s')
+
+def main(args: 'list[str]' = None) -> int:
+    parser = argparse.ArgumentParser(description='Generate or probe endgame tablebases.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate_parser = commands.add_parser('generate', help='build tables and the smaller ones they depend on')
+    generate_parser.add_argument('signatures', nargs='+', help='material like KQvK or KRvKN')
+    generate_parser.add_argument('--directory', default=TABLEBASE_DIRECTORY)
+    probe_parser = commands.add_parser('probe', help='look a position up')
+    probe_parser.add_argument('fen')
+    probe_parser.add_argument('--directory', default=TABLEBASE_DIRECTORY)
+    options = parser.parse_args(args)
+
+    if options.command == 'generate':
+        for signature in options.signatures:
+            generate(signature, options.directory)
+        return 0
+
+    tablebases = Tablebases(options.directory)
+    entry = tablebases.probe(BitboardPosition(options.fen))
+    tablebases.close()
+    if entry is None:
+        print('Not in the tablebases')
+        return 1
+
+    result, plies = entry
+    print({WIN: f'Win, mate in {plies} plies', DRAW: 'Draw', LOSS: f'Loss, mated in {plies} plies'}[result])
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing as mp
+import random
+import sys
+import time
+
+from engine.bitboard import BitboardPosition
+from engine.book import find_move
+from engine.parallel import ParallelSearch
+from engine.pgn import write_pgn
+from engine.position import START_FEN
+from engine.search import MAX_DEPTH, Search
+from engine.transposition import TranspositionTable
+from pieces.piece_code import PieceCode
+from util.moves import move_to_uci
+
+MAX_PLIES = 400
+FIFTY_MOVE_PLIES = 100
+# Pieces that can still force mate, a single bishop or knight cannot
+MATING_CODES = {PieceCode.PAWN, PieceCode.ROOKIE, PieceCode.QUEEN}
+
+
+class Player:
+    def __init__(self, settings: str, seed: int = 0):
+        # Settings are 'random' or comma separated depth=, time=, tt= and workers= values
+        self.settings = settings
+        self.is_random = settings == 'random'
+        self.generator = random.Random(seed)
+        self.max_depth = MAX_DEPTH
+        self.time_limit = float('inf')
+        self.transposition_table = None
+        self.workers = None
+        self.transposition_table_mb = None
+        self.parallel_search = None
+
+        if self.is_random:
+            return
+
+        values = dict(item.split('=') for item in settings.split(','))
+        self.max_depth = int(values.get('depth', MAX_DEPTH))
+        self.time_limit = float(values.get('time', 'inf'))
+        if 'workers' in values:
+            self.workers = int(values['workers'])
+            self.transposition_table_mb = float(values.get('tt', 16))
+        elif 'tt' in values:
+            self.transposition_table = TranspositionTable(float(values['tt']))
+        if self.max_depth == MAX_DEPTH and self.time_limit == float('inf'):
+            raise ValueError(f'Player {settings!r} needs a depth or a time limit')
+
+    def get_move(self, position: BitboardPosition) -> int:
+        if self.is_random:
+            return self.generator.choice(position.legal_moves())
+
+        if self.workers is not None:
+            # The pool is started by the first search, so players built only to check their settings start none
+            if self.parallel_search is None:
+                self.parallel_search = ParallelSearch(self.workers, self.transposition_table_mb)
+            move, _, _ = self.parallel_search.iterative_deepening(position.get_fen(), self.time_limit, self.max_depth)
+            return move
+
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        search = Search(BitboardPosition(position.get_fen()), self.transposition_table)
+        move, _, _ = search.iterative_deepening(self.time_limit, self.max_depth)
+        return move
+
+    def close(self):
+        if self.parallel_search is not None:
+            self.parallel_search.close()
+            self.parallel_search = None
+
+
+def has_mating_material(position: BitboardPosition) -> bool:
+    minor_pieces = 0
+    for square in range(64):
+        fen_code = position.get_fen_code(square)
+        if fen_code is None or fen_code.upper() == PieceCode.KING:
+            continue
+        if fen_code.upper() in MATING_CODES:
+            return True
+        minor_pieces += 1
+    return minor_pieces > 1
+
+def play_game(
+    game_index: int,
+    first_settings: str,
+    second_settings: str,
+    opening_plies: int,
+    max_plies: int,
+) -> dict:
+    # Pairs of games share a random opening, with the colours swapped
+    is_first_white = game_index % 2 == 0
+    opening_generator = random.Random(game_index // 2)
+    players = {
+        is_first_white: Player(first_settings, game_index),
+        not is_first_white: Player(second_settings, game_index),
+    }
+    times = {True: 0.0, False: 0.0}
+
+    position = BitboardPosition(START_FEN)
+    repetitions = {position.hash: 1}
+    moves = []
+    winner, reason = None, 'max-plies'
+
+    while len(moves) < max_plies:
+        if not position.has_any_legal_move():
+            if position.player_is_checked(position.is_white_turn):
+                winner, reason = not position.is_white_turn, 'checkmate'
+            else:
+                reason = 'stalemate'
+            break
+        if position.halfmove_clock >= FIFTY_MOVE_PLIES:
+            reason = 'fifty-move'
+            break
+        if repetitions[position.hash] >= 3:
+            reason = 'repetition'
+            break
+        if not has_mating_material(position):
+            reason = 'insufficient-material'
+            break
+
+        is_white = position.is_white_turn
+        start = time.perf_counter()
+        if len(moves) < opening_plies:
+            move = opening_generator.choice(position.legal_moves())
+        else:
+            move = players[is_white].get_move(position)
+        times[is_white] += time.perf_counter() - start
+
+        position.move_piece(move)
+        moves.append(move_to_uci(move))
+        repetitions[position.hash] = repetitions.get(position.hash, 0) + 1
+
+    for player in players.values():
+        player.close()
+    if winner is None:
+        result = 'draw'
+    else:
+        result = 'win' if winner == is_first_white else 'loss'
+    return {
+        'game': game_index,
+        'first_is_white': is_first_white,
+        'result': result,
+        'reason': reason,
+        'plies': len(moves),
+        'first_time': times[is_first_white],
+        'second_time': times[not is_first_white],
+        'moves': ' '.join(moves),
+    }
+
+def play_game_from_arguments(arguments: tuple) -> dict:
+    return play_game(*arguments)
+
+def write_game_pgn(path: str, first_settings: str, second_settings: str, result: dict):
+    position = BitboardPosition(START_FEN)
+    moves = []
+    for code in result['moves'].split():
+        moves.append(find_move(position, code))
+        position.move_piece(moves[-1])
+
+    first_is_white = result['first_is_white']
+    if result['result'] == 'draw':
+        pgn_result = '1/2-1/2'
+    else:
+        pgn_result = '1-0' if (result['result'] == 'win') == first_is_white else '0-1'
+    write_pgn(path, {
+        'Event': f'{first_settings} vs {second_settings}',
+        'Round': str(result['game'] + 1),
+        'White': first_settings if first_is_white else second_settings,
+        'Black': second_settings if first_is_white else first_settings,
+        'Result': pgn_result,
+        'Termination': result['reason'],
+    }, moves)
+
+def get_score(results: 'list[dict]') -> 'tuple[float, float]':
+    # Mean score of the first player and the 95% half-width of its confidence interval
+    scores = [{'win': 1.0, 'draw': 0.5, 'loss': 0.0}[result['result']] for result in results]
+    mean = sum(scores) / len(scores)
+    variance = sum((score - mean) ** 2 for score in scores) / len(scores)
+    return mean, 1.96 * math.sqrt(variance / len(scores))
+
+def get_elo(score: float) -> float:
+    if score <= 0:
+        return -float('inf')
+    if score >= 1:
+        return float('inf')
+    return -400 * math.log10(1 / score - 1)
+
+def get_summary(first_settings: str, second_settings: str, results: 'list[dict]') -> str:
+    wins = sum(result['result'] == 'win' for result in results)
+    draws = sum(result['result'] == 'draw' for result in results)
+    losses = len(results) - wins - draws
+    score, margin = get_score(results)
+    reasons = {}
+    for result in results:
+        reasons[result['reason']] = reasons.get(result['reason'], 0) + 1
+
+    return '\n'.join([
+        f'{first_settings} vs {second_settings}: {len(results)} games',
+        f'+{wins} ={draws} -{losses}  score {score:.3f} +/- {margin:.3f}',
+        f'Elo {get_elo(score):+.0f} [{get_elo(score - margin):+.0f}, {get_elo(score + margin):+.0f}]',
+        'Endings: ' + ', '.join(f'{reason} {count}' for reason, count in sorted(reasons.items())),
+    ])
+
+def run_tournament(
+    first_settings: str,
+    second_settings: str,
+    games: int,
+    workers: int,
+    output_path: str,
+    opening_plies: int = 4,
+    max_plies: int = MAX_PLIES,
+    pgn_path: str = None,
+) -> 'list[dict]':
+    # Fail before starting the pool when a setting is wrong
+    players = [Player(first_settings), Player(second_settings)]
+    # Daemonic pool processes cannot start the pools of parallel searches, so their games are played here in turn
+    is_parallel = any(player.workers is not None and player.workers > 1 for player in players)
+
+    arguments = [(game_index, first_settings, second_settings, opening_plies, max_plies) for game_index in range(games)]
+    results = []
+    with open(output_path, 'a') as output, contextlib.nullcontext() if is_parallel else mp.Pool(workers) as pool:
+        played = map(play_game_from_arguments, arguments) if pool is None else pool.imap_unordered(play_game_from_arguments, arguments)
+        for result in played:
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            if pgn_path is not None:
+                write_game_pgn(pgn_path, first_settings, second_settings, result)
+            results.append(result)
+            print(
+                f"game {result['game']}: {result['result']} by {result['reason']} in {result['plies']} plies"
+                f' ({len(results)}/{games})',
+                file=sys.stderr,
+            )
+    return results
+
+def main(args: 'list[str]' = None) -> int:
+    parser = argparse.ArgumentParser(description='Play engine settings against each other without a window.')
+    parser.add_argument('first', help="settings like 'depth=3', 'time=0.1,tt=16' or 'random'")
+    parser.add_argument('second')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=mp.cpu_count())
+    parser.add_argument('--output', default='tournament.jsonl', help='JSON lines file the results are appended to')
+    parser.add_argument('--opening-plies', type=int, default=4, help='random plies played before the engines take over')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES)
+    parser.add_argument('--pgn', help='PGN file every finished game is also appended to')
+    options = parser.parse_args(args)
+
+    results = run_tournament(
+        options.first,
+        options.second,
+        options.games,
+        options.workers,
+        options.output,
+        options.opening_plies,
+        options.max_plies,
+        options.pgn,
+    )
+    print(get_summary(options.first, options.second, results))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
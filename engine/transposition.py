@@ -0,0 +1,73 @@
+import ctypes
+import multiprocessing as mp
+from array import array
+
+EXACT, LOWER_BOUND, UPPER_BOUND = range(3)
+
+# Bytes per entry: key (8), score (8), move (4), depth (1), bound (1), generation (1)
+ENTRY_SIZE = 23
+
+class TranspositionTable:
+    def __init__(self, size_mb: float = 16, is_shared: bool = False):
+        self.size = max(1, int(size_mb * 1024 * 1024) // ENTRY_SIZE)
+        self.is_shared = is_shared
+        self.generation = 0
+        if is_shared:
+            # Shared memory handed to worker processes when they start, so it is only ever cleared in place
+            self.keys = mp.RawArray('Q', self.size)
+            self.scores = mp.RawArray('d', self.size)
+            self.moves = mp.RawArray('i', self.size)
+            self.depths = mp.RawArray('b', self.size)
+            self.bounds = mp.RawArray('B', self.size)
+            self.generations = mp.RawArray('B', self.size)
+        self.clear()
+
+    def clear(self):
+        if self.is_shared:
+            # Bytes of 255 store -1 in the signed moves and depths
+            for values, byte in (
+                (self.keys, 0),
+                (self.scores, 0),
+                (self.moves, 255),
+                (self.depths, 255),
+                (self.bounds, 0),
+                (self.generations, 0),
+            ):
+                ctypes.memset(ctypes.addressof(values), byte, ctypes.sizeof(values))
+            return
+
+        self.keys = array('Q', bytes(8 * self.size))
+        self.scores = array('d', bytes(8 * self.size))
+        self.moves = array('i', [-1]) * self.size
+        self.depths = array('b', [-1]) * self.size
+        self.bounds = array('B', bytes(self.size))
+        self.generations = array('B', bytes(self.size))
+
+    def new_search(self):
+        self.generation = (self.generation + 1) & 255
+
+    def probe(self, key: int) -> 'tuple[int, int, float, int]':
+        index = key % self.size
+        if self.keys[index] != key or self.depths[index] < 0:
+            return None
+
+        depth, bound, score, move = self.depths[index], self.bounds[index], self.scores[index], self.moves[index]
+        # Another process may have rewritten the entry while it was read
+        if self.keys[index] != key:
+            return None
+        return depth, bound, score, None if move < 0 else move
+
+    def store(self, key: int, depth: int, bound: int, score: float, move: int):
+        index = key % self.size
+        # Depth-preferred: a deeper entry of the current search is only replaced by its own position
+        if self.generations[index] == self.generation and self.keys[index] != key and self.depths[index] > depth:
+            return
+
+        # The key is written last so that readers never match a half-written entry
+        self.keys[index] = 0
+        self.depths[index] = depth
+        self.bounds[index] = bound
+        self.scores[index] = score
+        self.moves[index] = -1 if move is None else move
+        self.generations[index] = self.generation
+        self.keys[index] = key
@@ -0,0 +1,178 @@
+import argparse
+import itertools
+import json
+import math
+import sys
+import time
+from typing import Iterator
+
+import numpy as np
+
+from engine.batch import EMPTY, SCORE_TABLE, encode_fens
+from engine.bitboard import PIECE_CODES, BitboardPosition
+from engine.book import PGN_SCORES, read_games
+from engine.epd import read_epd
+from engine.position import START_FEN
+from pieces.piece import TUNED_TABLES_PATH
+from util.moves import EAT, PROMOTE
+
+PIECE_KINDS = 6
+PARAMETERS = PIECE_KINDS * 64
+CHUNK_SIZE = 65536
+# Exported scores are rounded to eighths so sums stay exact and two evaluations never differ by less than NULL_WINDOW
+SCORE_STEP = 0.125
+GOLDEN_RATIO = (1 + math.sqrt(5)) / 2
+
+def read_labelled_positions(path: str, skip_plies: int) -> 'Iterator[tuple[str, float]]':
+    # EPD positions carry the final score of white as a c9 result, games label their quiet positions with their outcome
+    if path.endswith('.epd'):
+        for position, operations in read_epd(path):
+            result = operations.get('c9', [None])[0]
+            if result in PGN_SCORES:
+                yield position.get_fen(), PGN_SCORES[result]
+        return
+
+    for moves, white_score in read_games(path):
+        if white_score is None:
+            continue
+        position = BitboardPosition(START_FEN)
+        for ply, move in enumerate(moves, 1):
+            position.move_piece(move)
+            if ply > skip_plies and not move & (EAT | PROMOTE) and not position.player_is_checked(position.is_white_turn):
+                yield position.get_fen(), white_score
+
+def load_dataset(paths: 'list[str]', skip_plies: int, max_positions: int = None) -> 'tuple[np.ndarray, np.ndarray]':
+    positions = itertools.chain.from_iterable(read_labelled_positions(path, skip_plies) for path in paths)
+    boards = []
+    results = []
+    while True:
+        chunk = list(itertools.islice(positions, CHUNK_SIZE if max_positions is None else min(CHUNK_SIZE, max_positions)))
+        if not chunk:
+            break
+        boards.append(encode_fens([fen for fen, _ in chunk]))
+        results.extend(white_score for _, white_score in chunk)
+        if max_positions is not None:
+            max_positions -= len(chunk)
+            if not max_positions:
+                break
+
+    if not boards:
+        return np.empty((0, 64), dtype=np.int8), np.empty(0)
+    return np.concatenate(boards), np.array(results)
+
+def get_terms(boards: np.ndarray) -> 'tuple[np.ndarray, np.ndarray, np.ndarray]':
+    # One term per piece: its position, the parameter of its kind and square seen from black, and its sign
+    position_ids, squares = np.nonzero(boards != EMPTY)
+    pieces = boards[position_ids, squares].astype(np.int32)
+    is_white = pieces < PIECE_KINDS
+    parameters = pieces % PIECE_KINDS * 64 + np.where(is_white, squares ^ 56, squares)
+    return position_ids.astype(np.int32), parameters.astype(np.int16), np.where(is_white, -1.0, 1.0)
+
+def get_initial_weights() -> np.ndarray:
+    # The black rows of the loaded score table, white pieces use them mirrored and negated
+    return SCORE_TABLE[PIECE_KINDS:2 * PIECE_KINDS].reshape(PARAMETERS).copy()
+
+def get_scores(weights: np.ndarray, terms: 'tuple[np.ndarray, np.ndarray, np.ndarray]', count: int) -> np.ndarray:
+    position_ids, parameters, signs = terms
+    return np.bincount(position_ids, weights=signs * weights[parameters], minlength=count)
+
+def predict(scores: np.ndarray, scale: float) -> np.ndarray:
+    # Expected score of white, evaluations are positive when black is better
+    return 1 / (1 + np.exp(np.clip(scale * scores, -500, 500)))
+
+def get_loss(scores: np.ndarray, results: np.ndarray, scale: float) -> float:
+    return float(np.mean((results - predict(scores, scale)) ** 2))
+
+def fit_scale(scores: np.ndarray, results: np.ndarray) -> float:
+    # Golden section search over the logarithm of the scale
+    low, high = math.log(1e-4), math.log(10.0)
+    for _ in range(60):
+        left = high - (high - low) / GOLDEN_RATIO
+        right = low + (high - low) / GOLDEN_RATIO
+        if get_loss(scores, results, math.exp(left)) < get_loss(scores, results, math.exp(right)):
+            high = right
+        else:
+            low = left
+    return math.exp((low + high) / 2)
+
+def tune(
+    boards: np.ndarray,
+    results: np.ndarray,
+    epochs: int,
+    learning_rate: float,
+    report_every: int = 10,
+) -> 'tuple[np.ndarray, float]':
+    terms = get_terms(boards)
+    position_ids, parameters, signs = terms
+    count = len(boards)
+    weights = get_initial_weights()
+    scale = fit_scale(get_scores(weights, terms, count), results)
+    print(f'{count} positions, scale {scale:.5f}, loss {get_loss(get_scores(weights, terms, count), results, scale):.6f}')
+
+    # Adam on the mean squared error between the results and the predicted scores
+    first_moment = np.zeros(PARAMETERS)
+    second_moment = np.zeros(PARAMETERS)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    start = time.perf_counter()
+    for epoch in range(1, epochs + 1):
+        predictions = predict(get_scores(weights, terms, count), scale)
+        errors = 2 * (predictions - results) * -scale * predictions * (1 - predictions) / count
+        gradient = np.bincount(parameters, weights=signs * errors[position_ids], minlength=PARAMETERS)
+
+        first_moment = beta1 * first_moment + (1 - beta1) * gradient
+        second_moment = beta2 * second_moment + (1 - beta2) * gradient ** 2
+        corrected_first = first_moment / (1 - beta1 ** epoch)
+        corrected_second = second_moment / (1 - beta2 ** epoch)
+        weights -= learning_rate * corrected_first / (np.sqrt(corrected_second) + epsilon)
+
+        if epoch % report_every == 0 or epoch == epochs:
+            elapsed = time.perf_counter() - start
+            loss = get_loss(get_scores(weights, terms, count), results, scale)
+            print(f'epoch {epoch}: loss {loss:.6f}, {count * epoch / elapsed * 60 / 1e6:.1f}M positions/min')
+    return weights, scale
+
+def get_trained_parameters(boards: np.ndarray) -> np.ndarray:
+    # Squares some piece of the data stands on, the others never get a gradient and keep their initial scores
+    _, parameters, _ = get_terms(boards)
+    return np.bincount(parameters, minlength=PARAMETERS) > 0
+
+def export_tables(weights: np.ndarray, path: str, is_trained: np.ndarray = None):
+    tables = {}
+    for kind in range(PIECE_KINDS):
+        scores = np.round(weights[kind * 64:(kind + 1) * 64] / SCORE_STEP) * SCORE_STEP
+        # The value is the median over trained squares only, so untouched squares like pawns on the last rows do not bias it
+        trained_scores = scores if is_trained is None else scores[is_trained[kind * 64:(kind + 1) * 64]]
+        if not len(trained_scores):
+            trained_scores = scores
+        value = float(np.round(np.median(trained_scores) / SCORE_STEP) * SCORE_STEP)
+        # Piece modules write their tables as white sees them, which is the black rows upside down
+        tables[PIECE_CODES[kind]] = {
+            'value': value,
+            'table': [[float(score - value) for score in scores[row * 8:row * 8 + 8]] for row in reversed(range(8))],
+        }
+    with open(path, 'w') as file:
+        json.dump(tables, file, indent=1)
+
+def main(args: 'list[str]' = None) -> int:
+    parser = argparse.ArgumentParser(description='Fit the piece values and square tables to game results.')
+    parser.add_argument('data', nargs='+', help='PGN files, tournament JSON lines, or EPD files with c9 results')
+    parser.add_argument('--output', default=TUNED_TABLES_PATH, help='tables loaded by the engine at startup')
+    parser.add_argument('--epochs', type=int, default=300)
+    parser.add_argument('--learning-rate', type=float, default=0.05)
+    parser.add_argument('--skip-plies', type=int, default=8, help='opening plies of each game left out')
+    parser.add_argument('--max-positions', type=int)
+    options = parser.parse_args(args)
+
+    start = time.perf_counter()
+    boards, results = load_dataset(options.data, options.skip_plies, options.max_positions)
+    print(f'Loaded {len(boards)} positions in {time.perf_counter() - start:.1f}s')
+    if not len(boards):
+        return 1
+
+    weights, _ = tune(boards, results, options.epochs, options.learning_rate)
+    export_tables(weights, options.output, get_trained_parameters(boards))
+    print(f'Tables written to {options.output}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import multiprocessing as mp
+import queue
+import threading
+from typing import Callable
+
+from engine.parallel import ParallelSearch
+from engine.profiler import Profiler
+from engine.search import MAX_DEPTH
+from engine.statistics import SearchStatistics
+from engine.tablebase import Tablebases
+
+
+def run_worker(
+    requests: mp.Queue,
+    results: mp.Queue,
+    current_request,
+    transposition_table_mb: float,
+    is_profiled: bool,
+    workers: int,
+):
+    search = ParallelSearch(workers, transposition_table_mb, Tablebases())
+    profiler = Profiler()
+    if is_profiled:
+        profiler.enable()
+
+    while True:
+        request = requests.get()
+        if request is None:
+            search.close()
+            results.put(None)
+            return
+
+        request_id, fen, time_limit = request
+        # Requests cancelled while queued are skipped, running ones stop at their next time check
+        if current_request.value != request_id:
+            continue
+
+        move, score, depth = search.iterative_deepening(
+            fen,
+            time_limit,
+            MAX_DEPTH,
+            lambda: current_request.value != request_id,
+        )
+        results.put((request_id, move, score, depth, search.statistics))
+
+        if is_profiled:
+            print(profiler.get_report())
+            profiler.reset()
+
+
+class SearchWorker:
+    def __init__(
+        self,
+        transposition_table_mb: float = 16,
+        is_profiled: bool = False,
+        on_result: 'Callable[[], None]' = None,
+        workers: int = 1,
+    ):
+        self.requests = mp.Queue()
+        self.results = mp.Queue()
+        self.received_results = queue.Queue()
+        self.current_request = mp.Value('i', 0)
+        self.is_searching = False
+        self.on_result = on_result
+        self.process = mp.Process(
+            target=run_worker,
+            args=(self.requests, self.results, self.current_request, transposition_table_mb, is_profiled, workers),
+            # Daemonic processes cannot start the pool of a parallel search
+            daemon=workers == 1,
+        )
+        self.process.start()
+        # Results are waited for on a thread, so callers sleeping until the next event can be woken
+        self.receiver = threading.Thread(target=self.receive_results, daemon=True)
+        self.receiver.start()
+
+    def receive_results(self):
+        while True:
+            result = self.results.get()
+            if result is None:
+                return
+            self.received_results.put(result)
+            if self.on_result is not None:
+                self.on_result()
+
+    def start(self, fen: str, time_limit: float):
+        self.current_request.value += 1
+        self.is_searching = True
+        self.requests.put((self.current_request.value, fen, time_limit))
+
+    def poll(self) -> 'tuple[int, float, int, SearchStatistics] | None':
+        while True:
+            try:
+                request_id, move, score, depth, statistics = self.received_results.get_nowait()
+            except queue.Empty:
+                return None
+
+            # Results of cancelled searches are dropped
+            if request_id == self.current_request.value:
+                self.is_searching = False
+                return move, score, depth, statistics
+
+    def cancel(self):
+        if self.is_searching:
+            self.current_request.value += 1
+            self.is_searching = False
+
+    def close(self):
+        self.cancel()
+        self.requests.put(None)
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.receiver.join(1)
@@ -0,0 +1,25 @@
+import random
+
+from pieces.piece_code import PieceCode
+
+ZOBRIST_SEED = 20221015
+
+def build_keys():
+    generator = random.Random(ZOBRIST_SEED)
+    piece_keys = {}
+    for fen_code in (PieceCode.PAWN, PieceCode.KNIGHT, PieceCode.BISHOP, PieceCode.ROOKIE, PieceCode.QUEEN, PieceCode.KING):
+        for code in (fen_code, fen_code.lower()):
+            piece_keys[code] = [generator.getrandbits(64) for _ in range(64)]
+    castling_keys = {right: generator.getrandbits(64) for right in 'KQkq'}
+    black_to_move_key = generator.getrandbits(64)
+    en_passant_keys = [generator.getrandbits(64) for _ in range(8)]
+    return piece_keys, castling_keys, black_to_move_key, en_passant_keys
+
+# Keys indexed by [fen code][square], by castling right, for black to move and by en passant file
+PIECE_KEYS, CASTLING_KEYS, BLACK_TO_MOVE_KEY, EN_PASSANT_KEYS = build_keys()
+
+def get_castling_key(castling_rights: str) -> int:
+    key = 0
+    for right in castling_rights:
+        key ^= CASTLING_KEYS[right]
+    return key
@@ -1,14 +1,31 @@
+import os
 import pygame
 import random as rd
+import time
 from board import Board
+from engine.book import OpeningBook
+from engine.pgn import get_result, write_pgn
+from engine.worker import SearchWorker
 from pieces.piece import Piece
-from pieces.piece_code import PieceCode
-from pieces.piece_factory import PieceFactory
-from util.colors import Colors
-
-from util.utils import from_code, is_king, is_pawn
+from util.moves import move_to_uci
 
 MAX_FPS = 60
+# Longest sleep of an idle board between two events
+IDLE_TIMEOUT_MS = 1000
+# Posted by the search worker when a result is ready, to wake an idle board
+AI_RESULT_EVENT = pygame.event.custom_type()
+TRANSPOSITION_TABLE_MB = 32
+# Processes of the AI search, more than one searches in parallel
+AI_WORKERS = 1
+AI_TIME_LIMIT = 1.0
+# JSON lines file receiving the statistics of every AI move, None to only print them
+AI_STATISTICS_PATH = None
+# Prints where the AI spends its time after every move
+PROFILE_AI = False
+# Built with `python -m engine.book build`, the AI searches every move when it is missing
+OPENING_BOOK_PATH = 'assets/book.bin'
+# PGN file finished games are appended to, like 'games.pgn', None to keep no record
+GAME_RECORD_PATH = None
 
 current_fps = MAX_FPS
 
@@ -17,16 +34,22 @@ class Game:
         self.running: bool = True
         self.width = width
         self.height = height
+        # Forked before the display exists, so the search processes inherit no SDL state
+        self.search_worker = SearchWorker(TRANSPOSITION_TABLE_MB, PROFILE_AI, self.notify_ai_result, AI_WORKERS)
         self.screen = pygame.display.set_mode((width, height))
         self.clock = pygame.time.Clock()
+        self.opening_book = OpeningBook(OPENING_BOOK_PATH) if os.path.exists(OPENING_BOOK_PATH) else None
         
         self.reset()
 
     def reset(self):
         self.cell_size = self.height / 8
         self.board = Board((self.width - self.height) / 2, self.cell_size)
+        self.search_worker.cancel()
 
-        self.is_white_turn = True
+        self.is_white_turn = self.board.position.is_white_turn
+        self.start_fen = self.board.position.get_fen()
+        self.moves: list[int] = []
 
         self.clicked_piece: Piece = None
         self.is_checkmate = False
@@ -35,23 +58,39 @@ class Game:
     def run(self):
         pygame.init()
 
-        while self.running:
-            self.clock.tick(MAX_FPS)
-            
-            self.screen.fill(Colors.BLACK)
-            
-            self.show_game_result()
-            
-            self.play_ai()
-            self.play_ai2()
-            
-            self.check_events()
-            
-            self.draw()
-
-            pygame.display.flip()
-
-        pygame.quit()
+        # A parallel search runs in a non-daemonic process, which has to be closed for the interpreter to exit
+        try:
+            while self.running:
+                self.show_game_result()
+                
+                self.play_ai()
+                self.play_ai2()
+                
+                self.check_events()
+                
+                dirty_rects = self.draw()
+                pygame.display.update(dirty_rects)
+
+                # Frames are paced at MAX_FPS only while the board changes, otherwise the loop sleeps until the next event
+                if dirty_rects:
+                    self.clock.tick(MAX_FPS)
+                else:
+                    self.wait_for_event()
+        finally:
+            self.search_worker.close()
+            if self.opening_book is not None:
+                self.opening_book.close()
+            pygame.quit()
+
+    def wait_for_event(self):
+        event = pygame.event.wait(IDLE_TIMEOUT_MS)
+        # The event is handled by check_events with the ones arriving after it
+        if event.type != pygame.NOEVENT:
+            pygame.event.post(event)
+
+    def notify_ai_result(self):
+        # Called from the search worker's receiving thread
+        pygame.event.post(pygame.event.Event(AI_RESULT_EVENT))
 
     def check_events(self):
         for event in pygame.event.get():
@@ -62,6 +101,10 @@ class Game:
                 if event.button == 1:
                     self.handle_mouse_click()
 
+            # The result may have arrived after play_ai polled, playing it here keeps the loop from sleeping on it
+            if event.type == AI_RESULT_EVENT:
+                self.play_ai()
+
     def handle_mouse_click(self):
         mouse_x, mouse_y = pygame.mouse.get_pos()
         x, y = self.board.get_cell(mouse_x, mouse_y)
@@ -83,58 +126,39 @@ class Game:
             return
 
         clicked_cell = self.board.get_piece_cell(self.clicked_piece)
-        if self.clicked_piece.is_valid_movement(self.board.get(), clicked_cell, x, y):
-            self.move_piece(self.clicked_piece, clicked_cell, (x, y))
+        movement = self.board.position.get_movement(clicked_cell, (x, y))
+        if movement is not None:
+            self.move_piece(movement)
             self.clicked_piece = None
 
-    def move_piece(self, piece: Piece, from_pos: 'tuple[int, int]', to_pos: 'tuple[int, int]'):
-        movement = piece.get_movement(self.board.get(), from_pos, to_pos)
-        success = self.board.try_move_piece(piece, self.is_white_turn, from_pos, to_pos)
+    def move_piece(self, movement: int):
+        # A search started from the previous position is no longer useful
+        self.search_worker.cancel()
+        success = self.board.try_move_piece(movement)
         if success:
-            self.check_special_movements(piece, movement)
-
-            piece.moved()
-            self.is_white_turn = not self.is_white_turn
+            self.moves.append(movement)
+            self.is_white_turn = self.board.position.is_white_turn
             self.check_game_result()
         return success
 
-    def check_special_movements(self, piece: Piece, movement: str):
-        if is_king(piece) or is_pawn(piece):
-            cell, _,  will_castle, will_promote = from_code(movement)
-            if will_castle:
-                self.castle(cell)
-            elif will_promote:
-                self.promote(cell)
-
-    def castle(self, cell: 'tuple[int, int]'):
-        x, y = cell
-        if x > 4:
-            rookie_pos = (7, y)
-            rookie = self.board.at(rookie_pos)
-            if self.is_white_turn:
-                self.move_piece(rookie, rookie_pos, (x - 1, y))
-            else:
-                self.move_piece(rookie, rookie_pos, (x - 2, y))
-        else:
-            rookie_pos = (0, y)
-            rookie = self.board.at(rookie_pos)
-            if self.is_white_turn:
-                self.move_piece(rookie, rookie_pos, (x + 1, y))
-            else:
-                self.move_piece(rookie, rookie_pos, (x + 2, y))
-        self.is_white_turn = not self.is_white_turn
-
-    def promote(self, cell: 'tuple[int, int]'):
-        fen_code = PieceCode.QUEEN
-        if not self.is_white_turn:
-            fen_code = fen_code.lower()
-
-        self.board.set_piece_at(PieceFactory.create(fen_code, self.cell_size), cell)
-
     def check_game_result(self):
-        self.is_checkmate, self.is_stalemate = self.board.check_game_result(self.is_white_turn)
+        self.is_checkmate, self.is_stalemate = self.board.check_game_result()
+
+    def record_game(self):
+        if GAME_RECORD_PATH is None:
+            return
+        headers = {
+            'Event': 'Casual game',
+            'Date': time.strftime('%Y.%m.%d'),
+            'White': 'Random',
+            'Black': 'Engine',
+            'Result': get_result(self.board.position),
+        }
+        write_pgn(GAME_RECORD_PATH, headers, self.moves, self.start_fen)
 
     def show_game_result(self):
+        if self.is_game_over():
+            self.record_game()
         if self.is_checkmate:
             if self.is_white_turn:
                 print('Checkmate Black Wins')
@@ -147,117 +171,41 @@ class Game:
             input('Press Enter to Reset...')
             self.reset()
 
-    def draw(self):
-        self.board.draw(self.screen, self.clicked_piece)
+    def draw(self) -> 'list[pygame.Rect]':
+        return self.board.draw(self.screen, self.clicked_piece)
 
     def play_ai(self):
-        if not self.is_white_turn and not self.is_game_over():
-            piece, move, score = self.maxi(4, self.is_white_turn, float('-inf'), float('inf'))
+        if self.is_white_turn or self.is_game_over():
+            return
+
+        if not self.search_worker.is_searching:
+            if self.opening_book is not None:
+                move = self.opening_book.get_move(self.board.position)
+                if move is not None:
+                    self.move_piece(move)
+                    print(f'{move_to_uci(move)} from book')
+                    return
+            self.search_worker.start(self.board.position.get_fen(), AI_TIME_LIMIT)
+            return
+
+        result = self.search_worker.poll()
+        if result is not None:
+            move, _, _, statistics = result
             if move is None:
                 # print('Got here')
                 # self.check_game_result()
                 return
 
-            move_cell, _, _, _ = from_code(move)
-            self.move_piece(piece, self.board.get_piece_cell(piece), move_cell)
-            print(score)
-            
-    def maxi(
-        self,
-        depth: int,
-        is_white: bool,
-        alpha: int,
-        beta: int,
-    ) -> 'tuple[Piece, str, int]':
-        if depth == 0:
-            return None, None, self.board.evaluate()
-
-        best_piece = None
-        best_move = None
-        best_score = float('-inf')
-
-        all_possible_moves = []
-        for piece, piece_cell in self.board.get_pieces(is_white):
-            for move in piece.get_valid_movements(self.board.get(), piece_cell):
-                all_possible_moves.append((piece, piece_cell, move))
-        
-        for piece, piece_cell, move in all_possible_moves:
-            move_cell, _, _, _ = from_code(move)
-
-            piece_was_moved = piece.was_moved
-
-            eaten_piece = self.board.move_piece(piece, piece_cell, move_cell)
-            is_checked = self.board.player_is_checked(is_white)
-            if not is_checked:
-                piece.moved()
-                _, _, score = self.mini(depth-1, not is_white, alpha, beta)
-                if score > best_score:
-                    best_piece = piece
-                    best_move = move
-                    best_score = score
-                alpha = max(alpha, score)
-            self.board.reject_move_piece(piece, eaten_piece, piece_cell, move_cell)
-            piece.was_moved = piece_was_moved
-
-            if beta <= alpha:
-                break
-        return best_piece, best_move, best_score
-
-    def mini(
-        self,
-        depth: int,
-        is_white: bool,
-        alpha: int,
-        beta: int,
-    ) -> 'tuple[Piece, str, int]':
-        if depth == 0:
-            return None, None, self.board.evaluate()
-
-        worst_piece = None
-        worst_move = None
-        worst_score = float('inf')
-
-        all_possible_moves = []
-        for piece, piece_cell in self.board.get_pieces(is_white):
-            for move in piece.get_valid_movements(self.board.get(), piece_cell):
-                all_possible_moves.append((piece, piece_cell, move))
-        
-        for piece, piece_cell, move in all_possible_moves:
-            move_cell, _, _, _ = from_code(move)
-
-            piece_was_moved = piece.was_moved
-
-            eaten_piece = self.board.move_piece(piece, piece_cell, move_cell)
-            is_checked = self.board.player_is_checked(is_white)
-            if not is_checked:
-                piece.moved()
-                _, _, score = self.maxi(depth-1, not is_white, alpha, beta)
-                if score < worst_score:
-                    worst_piece = piece
-                    worst_move = move
-                    worst_score = score
-                beta = min(beta, score)
-            self.board.reject_move_piece(piece, eaten_piece, piece_cell, move_cell)
-            piece.was_moved = piece_was_moved
-
-            if beta <= alpha:
-                break
-        return worst_piece, worst_move, worst_score
+            self.move_piece(move)
+            print(statistics.get_summary())
+            if AI_STATISTICS_PATH is not None:
+                statistics.write_json_line(AI_STATISTICS_PATH)
         
     def play_ai2(self):
         if self.is_white_turn and not self.is_game_over():
-            pieces = self.board.get_pieces(self.is_white_turn)
-            while True:
-                chosen_piece, piece_cell = rd.choice(pieces)
-
-                movements = chosen_piece.get_valid_movements(self.board.get(), piece_cell)
-                if len(movements) > 0:
-                    chosen_move = rd.choice(movements)
-                    movement_cell, _, _, _ = from_code(chosen_move)
-                    if chosen_piece.is_valid_movement(self.board.get(), piece_cell, movement_cell[0], movement_cell[1]):
-                        success = self.move_piece(chosen_piece, piece_cell, movement_cell)
-                        if success:
-                            break
+            movements = self.board.position.legal_moves()
+            if len(movements) > 0:
+                self.move_piece(rd.choice(movements))
 
     def is_game_over(self):
         return self.is_checkmate or self.is_stalemate
\ No newline at end of file
@@ -1,4 +1,5 @@
 from game import Game
 
-game = Game(1000, 600)
-game.run()
\ No newline at end of file
+if __name__ == '__main__':
+    game = Game(1000, 600)
+    game.run()
\ No newline at end of file
@@ -1,59 +1,68 @@
-from pieces.piece import Piece
+from pieces.piece import Piece, build_scores
 from pieces.piece_code import PieceCode
-from util.utils import is_inside_board, to_code
+from util.moves import EAT, encode_move, encode_promotions, get_square
+from util.utils import is_inside_board
 
+POSITION_TABLE = [
+    [5  ,  5  ,  5,  5  ,  5  ,  5,  5  , 5  ],
+    [5  ,  5  ,  5,  5  ,  5  ,  5,  5  , 5  ],
+    [1  ,  1  ,  2,  3  ,  3  ,  2,  1  , 1  ],
+    [0.5,  0.5,  1,  2.5,  2.5,  1,  0.5, 0.5],
+    [0  ,  0  ,  0,  2  ,  2  ,  0,  0  , 0  ],
+    [0.5, -0.5, -1,  0  ,  0  , -1, -0.5, 0.5],
+    [0.5,  1  ,  1, -2  , -2  ,  1,  1  , 0.5],
+    [0  ,  0  ,  0,  0  ,  0  ,  0,  0  , 0  ],
+]
+SCORES = build_scores(PieceCode.PAWN, 10, POSITION_TABLE)
 
 class Pawn(Piece):
-    def __init__(self, cell_size: int, is_white: bool):
-        super().__init__(cell_size, is_white)
+    def __init__(self, is_white: bool):
+        super().__init__(is_white)
 
     def get_fen_code(self) -> str:
         if self.is_white:
             return PieceCode.PAWN
         return f'{PieceCode.PAWN.lower()}'
 
-    def get_valid_movements(self, board: 'list[list[Piece]]', cell: 'tuple[int, int]') -> 'list[str]':
+    def get_valid_movements(self, board: 'list[list[Piece]]', cell: 'tuple[int, int]') -> 'list[int]':
         movements = []
+        from_square = get_square(cell[0], cell[1])
   
         if self.is_white: delta = -1
         else: delta = 1
 
         x, y = cell
         if is_inside_board(board, x, y + delta) and board[y + delta][x] is None:
-            movements.append(to_code(x, y + delta, will_promote=self.will_promote(board, y + delta)))
-            if not self.was_moved:
+            movements.extend(self.get_movements(board, from_square, x, y + delta))
+            if y == self.get_start_row(board):
                 if is_inside_board(board, x, y + delta*2) and board[y + delta*2][x] is None:
-                    movements.append(to_code(x, y + delta*2))
+                    movements.append(encode_move(from_square, get_square(x, y + delta*2)))
 
         if is_inside_board(board, x + 1, y + delta):
             right_diagonal = board[y + delta][x + 1]
             if right_diagonal is not None and right_diagonal.is_white != self.is_white:
-                movements.append(to_code(x + 1, y + delta, will_eat=True, will_promote=self.will_promote(board, y + delta)))
+                movements.extend(self.get_movements(board, from_square, x + 1, y + delta, EAT))
 
         if is_inside_board(board, x - 1, y + delta):
             left_diagonal = board[y + delta][x - 1]
             if left_diagonal is not None and left_diagonal.is_white != self.is_white:
-                movements.append(to_code(x - 1, y + delta, will_eat=True, will_promote=self.will_promote(board, y + delta)))
+                movements.extend(self.get_movements(board, from_square, x - 1, y + delta, EAT))
 
 
         return movements
 
+    def get_movements(self, board: 'list[list[Piece]]', from_square: int, x: int, y: int, flags: int = 0) -> 'list[int]':
+        if self.will_promote(board, y):
+            return encode_promotions(from_square, get_square(x, y), flags)
+        return [encode_move(from_square, get_square(x, y), flags)]
+
+    def get_start_row(self, board: 'list[list[Piece]]') -> int:
+        if self.is_white:
+            return len(board) - 2
+        return 1
+
     def will_promote(self, board: 'list[list[Piece]]', y: int) -> bool:
         return y == 0 or y == len(board) - 1
 
     def score(self, cell: 'tuple[int, int]') -> float:
-        position_table = [
-            [5  ,  5  ,  5,  5  ,  5  ,  5,  5  , 5  ],
-            [5  ,  5  ,  5,  5  ,  5  ,  5,  5  , 5  ],
-            [1  ,  1  ,  2,  3  ,  3  ,  2,  1  , 1  ],
-            [0.5,  0.5,  1,  2.5,  2.5,  1,  0.5, 0.5],
-            [0  ,  0  ,  0,  2  ,  2  ,  0,  0  , 0  ],
-            [0.5, -0.5, -1,  0  ,  0  , -1, -0.5, 0.5],
-            [0.5,  1  ,  1, -2  , -2  ,  1,  1  , 0.5],
-            [0  ,  0  ,  0,  0  ,  0  ,  0,  0  , 0  ],
-        ]
-        if not self.is_white:
-            position_table = list(reversed(position_table))
-        
-        x, y = cell
-        return 10 + position_table[y][x]
+        return SCORES[self.is_white][get_square(cell[0], cell[1])]
\ No newline at end of file
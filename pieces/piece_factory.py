@@ -8,18 +8,12 @@ from pieces.queen import Queen
 from pieces.rookie import Rookie
 
 class PieceFactory:
-    def create(fen_code: str, cell_size: int) -> Piece:
+    def create(fen_code: str) -> Piece:
         return {
-            PieceCode.PAWN: Pawn(cell_size, True),
-            PieceCode.ROOKIE: Rookie(cell_size, True),
-            PieceCode.KNIGHT: Knight(cell_size, True),
-            PieceCode.BISHOP: Bishop(cell_size, True),
-            PieceCode.QUEEN: Queen(cell_size, True),
-            PieceCode.KING: King(cell_size, True),
-            f'{PieceCode.PAWN.lower()}': Pawn(cell_size, False),
-            f'{PieceCode.ROOKIE.lower()}': Rookie(cell_size, False),
-            f'{PieceCode.KNIGHT.lower()}': Knight(cell_size, False),
-            f'{PieceCode.BISHOP.lower()}': Bishop(cell_size, False),
-            f'{PieceCode.QUEEN.lower()}': Queen(cell_size, False),
-            f'{PieceCode.KING.lower()}': King(cell_size, False),
-        }[fen_code]
\ No newline at end of file
+            PieceCode.PAWN: Pawn,
+            PieceCode.ROOKIE: Rookie,
+            PieceCode.KNIGHT: Knight,
+            PieceCode.BISHOP: Bishop,
+            PieceCode.QUEEN: Queen,
+            PieceCode.KING: King,
+        }[fen_code.upper()](fen_code.isupper())
\ No newline at end of file
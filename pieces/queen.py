@@ -1,19 +1,32 @@
-from pieces.piece import Piece
+from pieces.piece import Piece, build_scores
 from pieces.piece_code import PieceCode
-from util.utils import is_inside_board, to_code
-
+from util.moves import EAT, encode_move, get_square
+from util.utils import is_inside_board
+
+POSITION_TABLE = [
+    [-2  , -1  , -1  , -0.5, -0.5, -1  , -1, -2  ],
+    [-1  ,  0  ,  0  ,  0  ,  0  ,  0  ,  0, -1  ],
+    [-1  ,  0  ,  0.5,  0.5,  0.5,  0.5,  0, -1  ],
+    [-0.5,  0  ,  0.5,  0.5,  0.5,  0.5,  0, -0.5],
+    [ 0  ,  0  ,  0.5,  0.5,  0.5,  0.5,  0, -0.5],
+    [-1  ,  0.5,  0.5,  0.5,  0.5,  0.5,  0, -1  ],
+    [-1  ,  0  ,  0.5,  0  ,  0  ,  0  ,  0, -1  ],
+    [-2  , -1  , -1  , -0.5, -0.5, -1  , -1, -2  ],
+]
+SCORES = build_scores(PieceCode.QUEEN, 90, POSITION_TABLE)
 
 class Queen(Piece):
-    def __init__(self, cell_size: int, is_white: bool):
-        super().__init__(cell_size, is_white)
+    def __init__(self, is_white: bool):
+        super().__init__(is_white)
 
     def get_fen_code(self) -> str:
         if self.is_white:
             return PieceCode.QUEEN
         return f'{PieceCode.QUEEN.lower()}'
 
-    def get_valid_movements(self, board: 'list[list[Piece]]', cell: 'tuple[int, int]') -> 'list[str]':
+    def get_valid_movements(self, board: 'list[list[Piece]]', cell: 'tuple[int, int]') -> 'list[int]':
         movements = []
+        from_square = get_square(cell[0], cell[1])
 
         directions = [
             (1 , 0),
@@ -34,28 +47,14 @@ class Queen(Piece):
                 piece = board[y][x]
                 if piece is not None:
                     if piece.is_white != self.is_white:
-                        movements.append(to_code(x, y, will_eat=True))
+                        movements.append(encode_move(from_square, get_square(x, y), EAT))
                     break
                 
-                movements.append(to_code(x, y))
+                movements.append(encode_move(from_square, get_square(x, y)))
                 x += direction[0]
                 y += direction[1]
 
         return movements
     
     def score(self, cell: 'tuple[int, int]') -> float:
-        position_table = [
-            [-2  , -1  , -1  , -0.5, -0.5, -1  , -1, -2  ],
-            [-1  ,  0  ,  0  ,  0  ,  0  ,  0  ,  0, -1  ],
-            [-1  ,  0  ,  0.5,  0.5,  0.5,  0.5,  0, -1  ],
-            [-0.5,  0  ,  0.5,  0.5,  0.5,  0.5,  0, -0.5],
-            [ 0  ,  0  ,  0.5,  0.5,  0.5,  0.5,  0, -0.5],
-            [-1  ,  0.5,  0.5,  0.5,  0.5,  0.5,  0, -1  ],
-            [-1  ,  0  ,  0.5,  0  ,  0  ,  0  ,  0, -1  ],
-            [-2  , -1  , -1  , -0.5, -0.5, -1  , -1, -2  ],
-        ]
-        if not self.is_white:
-            position_table = list(reversed(position_table))
-
-        x, y = cell
-        return 90 + position_table[y][x]
\ No newline at end of file
+        return SCORES[self.is_white][get_square(cell[0], cell[1])]
\ No newline at end of file
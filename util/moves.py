@@ -0,0 +1,56 @@
+from pieces.piece_code import PieceCode
+from util.utils import to_code
+
+# A move is packed into an int:
+#   bits 0-5   from square (y * 8 + x)
+#   bits 6-11  to square
+#   bit  12    eat
+#   bit  13    castle
+#   bit  14    promote
+#   bits 15-16 promoted piece, index into PROMOTIONS
+#   bit  17    en passant
+SQUARE_MASK = 63
+TO_SHIFT = 6
+EAT = 1 << 12
+CASTLE = 1 << 13
+PROMOTE = 1 << 14
+PROMOTION_SHIFT = 15
+EN_PASSANT = 1 << 17
+
+PROMOTIONS = [PieceCode.QUEEN, PieceCode.ROOKIE, PieceCode.BISHOP, PieceCode.KNIGHT]
+
+def get_square(x: int, y: int) -> int:
+    return y * 8 + x
+
+def get_cell(square: int) -> 'tuple[int, int]':
+    return square & 7, square >> 3
+
+def parse_square(code: str) -> int:
+    return get_square(ord(code[0]) - ord('a'), 8 - int(code[1]))
+
+def encode_move(from_square: int, to_square: int, flags: int = 0) -> int:
+    return from_square | to_square << TO_SHIFT | flags
+
+def encode_promotions(from_square: int, to_square: int, flags: int = 0) -> 'list[int]':
+    move = from_square | to_square << TO_SHIFT | flags | PROMOTE
+    return [move | index << PROMOTION_SHIFT for index in range(len(PROMOTIONS))]
+
+def get_from_square(move: int) -> int:
+    return move & SQUARE_MASK
+
+def get_to_square(move: int) -> int:
+    return move >> TO_SHIFT & SQUARE_MASK
+
+def get_promotion(move: int) -> str:
+    if move & PROMOTE:
+        return PROMOTIONS[move >> PROMOTION_SHIFT & 3]
+    return None
+
+def move_to_uci(move: int) -> str:
+    from_x, from_y = get_cell(get_from_square(move))
+    to_x, to_y = get_cell(get_to_square(move))
+    code = to_code(from_x, from_y) + to_code(to_x, to_y)
+    promotion = get_promotion(move)
+    if promotion is not None:
+        code += promotion.lower()
+    return code
@@ -0,0 +1,27 @@
+import pygame
+
+from pieces.piece_code import PieceCode
+
+class SpriteCache:
+    source_images = {
+        PieceCode.PAWN: 'assets/pawn_white.png',
+        PieceCode.ROOKIE: 'assets/rookie_white.png',
+        PieceCode.KNIGHT: 'assets/knight_white.png',
+        PieceCode.BISHOP: 'assets/bishop_white.png',
+        PieceCode.QUEEN: 'assets/queen_white.png',
+        PieceCode.KING: 'assets/king_white.png',
+        f'{PieceCode.PAWN.lower()}': 'assets/pawn_black.png',
+        f'{PieceCode.ROOKIE.lower()}': 'assets/rookie_black.png',
+        f'{PieceCode.KNIGHT.lower()}': 'assets/knight_black.png',
+        f'{PieceCode.BISHOP.lower()}': 'assets/bishop_black.png',
+        f'{PieceCode.QUEEN.lower()}': 'assets/queen_black.png',
+        f'{PieceCode.KING.lower()}': 'assets/king_black.png',
+    }
+    sprites: 'dict[tuple[str, int], pygame.Surface]' = {}
+
+    def get(fen_code: str, cell_size: int) -> pygame.Surface:
+        key = (fen_code, cell_size)
+        if key not in SpriteCache.sprites:
+            image = pygame.image.load(SpriteCache.source_images[fen_code]).convert_alpha()
+            SpriteCache.sprites[key] = pygame.transform.scale(image, (cell_size, cell_size))
+        return SpriteCache.sprites[key]